@@ -1,399 +1,1585 @@
+import bisect
+import hashlib
 import json
+import math
 import openpyxl
+import os
+import queue
 import re
-from tkinter import filedialog
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from json.decoder import WHITESPACE as JSON_WHITESPACE, scanstring
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter
+from xml.etree import ElementTree
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def split_span_name(span_name: str):
+    # Spans of a prefixed merge are named '<workbook>/<sheet>'; a sheet name never holds a '/'
+    span_name = span_name.rsplit('/', 1)[-1]
+    beam_storey = re.findall('V(.+?)-', span_name)[0]
+    try:
+        beam_number = re.findall(r"-(.+?)\(", span_name)[0]
+    except BaseException:
+        beam_number = span_name.split('-')[1]
+    return beam_storey, beam_number
+
+
+def get_span_beam(span_name: str):
+    beam_storey, beam_number = split_span_name(span_name)
+    return 'V' + beam_storey + '-' + beam_number, beam_storey
+
+
+def new_beam_info(beam_name: str):
+    return {
+        "beam_name": beam_name,
+        "spans_num": 0,
+        "spans_info": []
+    }
+
+
+def add_beam_span(beam_dict: dict, span_info: dict):
+    beam_dict['spans_num'] += 1
+    beam_dict['spans_info'].append(span_info)
+
+
+SPAN_FIRST_ROW = 78
+SPAN_LAST_ROW = 431
+SPAN_LAST_COLUMN = 27  # column AA
+
+# Longitudinal bar blocks of a span sheet. 'bars' holds the (quantity, diameter) cells of both bar groups, the cuts
+# are the two cut cells measured from the reference cell of the support and 'tie' mirrors the tie_info flags layout
+BAR_CELLS = [
+    {'case': 0, 'side': 1, 'order': 0, 'quantity': None,  # Top long bar
+     'bars': [('O90', 'Q90'), ('O91', 'Q91')],
+     'left_cut': (('F189', 'F190'), 'F219'), 'right_cut': (('F258', 'F259'), 'F257'),
+     'tie': ['E97', ['N90', 'N91'], 'AA97', ['R90', 'R91']]},
+    {'case': 0, 'side': -1, 'order': 0, 'quantity': None,  # Bottom long bar
+     'bars': [('O135', 'Q135'), ('O136', 'Q136')],
+     'left_cut': (('F204', 'F205'), 'F219'), 'right_cut': (('F273', 'F274'), 'F257'),
+     'tie': ['E125', ['N135', 'N136'], 'AA125', ['R135', 'R136']]},
+    {'case': 1, 'side': 1, 'order': 1, 'quantity': 'top_left',  # Top left first order bar
+     'bars': [('J101', 'L101'), ('J103', 'L103')],
+     'left_cut': (('F194', 'F195'), 'F219'), 'right_cut': (('F220', 'F220'), 'F219'),
+     'tie': ['E99', ['I101', 'I103']]},
+    {'case': 1, 'side': 1, 'order': 2, 'quantity': 'top_left',  # Top left second order bar
+     'bars': [('F103', 'H103'), ('F105', 'H105')],
+     'left_cut': (('F199', 'F200'), 'F219'), 'right_cut': (('F223', 'F223'), 'F219'),
+     'tie': ['E101', ['E103', 'E105']]},
+    {'case': 1, 'side': -1, 'order': 1, 'quantity': 'bottom_left',  # Bottom left first order bar
+     'bars': [('J118', 'L118'), ('J120', 'L120')],
+     'left_cut': (('F209', 'F210'), 'F219'), 'right_cut': (('F226', 'F226'), 'F219'),
+     'tie': ['E123', ['I118', 'I120']]},
+    {'case': 1, 'side': -1, 'order': 2, 'quantity': 'bottom_left',  # Bottom left second order bar
+     'bars': [('F116', 'H116'), ('F118', 'H118')],
+     'left_cut': (('F214', 'F215'), 'F219'), 'right_cut': (('F229', 'F229'), 'F219'),
+     'tie': ['E121', ['E116', 'E118']]},
+    {'case': 2, 'side': -1, 'order': 1, 'quantity': 'bottom_center',  # Bottom central first order bar
+     'bars': [('O116', 'Q116'), ('O118', 'Q118')],
+     'left_cut': (('F232', 'F232'), 'F219'), 'right_cut': (('F251', 'F251'), 'F257'),
+     'tie': [False, False]},
+    {'case': 2, 'side': -1, 'order': 2, 'quantity': 'bottom_center',  # Bottom central second order bar
+     'bars': [('O108', 'Q108'), ('O110', 'Q110')],
+     'left_cut': (('F235', 'F235'), 'F219'), 'right_cut': (('F254', 'F254'), 'F257'),
+     'tie': [False, False]},
+    {'case': 3, 'side': 1, 'order': 1, 'quantity': 'top_right',  # Top right first order bar
+     'bars': [('T101', 'V101'), ('T103', 'V103')],
+     'left_cut': (('F239', 'F239'), 'F257'), 'right_cut': (('F263', 'F264'), 'F257'),
+     'tie': ['AA99', ['W101', 'W103']]},
+    {'case': 3, 'side': 1, 'order': 2, 'quantity': 'top_right',  # Top right second order bar
+     'bars': [('X103', 'Z103'), ('X105', 'Z105')],
+     'left_cut': (('F242', 'F242'), 'F257'), 'right_cut': (('F268', 'F269'), 'F257'),
+     'tie': ['AA101', ['AA103', 'AA105']]},
+    {'case': 3, 'side': -1, 'order': 1, 'quantity': 'bottom_right',  # Bottom right first order bar
+     'bars': [('T118', 'V118'), ('T120', 'V120')],
+     'left_cut': (('F245', 'F245'), 'F257'), 'right_cut': (('F278', 'F279'), 'F257'),
+     'tie': ['AA123', ['W118', 'W120']]},
+    {'case': 3, 'side': -1, 'order': 2, 'quantity': 'bottom_right',  # Bottom right second order bar
+     'bars': [('X116', 'Z116'), ('X118', 'Z118')],
+     'left_cut': (('F248', 'F248'), 'F257'), 'right_cut': (('F283', 'F284'), 'F257'),
+     'tie': ['AA121', ['AA116', 'AA118']]}
+]
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIPS_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_RELATIONSHIPS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+SHARED_STRING_CELL = re.compile(rb'<(?:\w+:)?c\b[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)<')
+
+# Stirrup zones are listed downwards from the first row until column M holds the closing 1; the last row is the
+# hard limit before the next block of the sheet (r2l header at row 424, totals at row 431)
+STIRRUP_ROWS = {'l2r': (417, 423), 'r2l': (425, 430)}
+STIRRUP_COLUMNS = (13, 16)  # columns M to P: end mark, quantity, (O), spacing
+
+
+def get_span_addresses():
+    addresses = {'L78', 'N78', 'L79', 'L80', 'N80', 'Q78', 'Q79',
+                 'I414', 'I416', 'J416', 'L416', 'I424', 'J424', 'L424', 'M431', 'U431'}
+    for bar in BAR_CELLS:
+        for quantity, diameter in bar['bars']:
+            addresses.update([quantity, diameter])
+        for (cut_1, cut_2), reference in [bar['left_cut'], bar['right_cut']]:
+            addresses.update([cut_1, cut_2, reference])
+        flags = list(bar['tie'])
+        while flags:
+            flag = flags.pop()
+            if isinstance(flag, list):
+                flags.extend(flag)
+            elif flag is not False:
+                addresses.add(flag)
+    for first_row, last_row in STIRRUP_ROWS.values():
+        for row in range(first_row, last_row + 1):
+            addresses.update(column + str(row) for column in ['M', 'N', 'P'])
+    return frozenset(addresses)
+
+
+# Every cell read_span_info looks at; the xml engine keeps only these
+SPAN_ADDRESSES = get_span_addresses()
+
+
+@lru_cache(maxsize=None)
+def split_address(address: str):
+    return coordinate_to_tuple(address)
+
+
+class CellReader:
+    def __init__(self, ws):
+        self.ws = ws
+
+    def __getitem__(self, address):
+        return self.ws[address].value
+
+    def read_rows(self, first_row: int, last_row: int, first_column: int, last_column: int):
+        return list(self.ws.iter_rows(min_row=first_row, max_row=last_row, min_col=first_column,
+                                      max_col=last_column, values_only=True))
+
+
+class GridReader:
+    def __init__(self, ws, first_row: int = SPAN_FIRST_ROW, last_row: int = SPAN_LAST_ROW,
+                 last_column: int = SPAN_LAST_COLUMN):
+        self.first_row = first_row
+        self.rows = list(ws.iter_rows(min_row=first_row, max_row=last_row, max_col=last_column, values_only=True))
+
+    def __getitem__(self, address):
+        row, column = split_address(address)
+        try:
+            return self.rows[row - self.first_row][column - 1]
+        except IndexError:
+            return None
+
+    def read_rows(self, first_row: int, last_row: int, first_column: int, last_column: int):
+        return [tuple(self[get_column_letter(column) + str(row)] for column in range(first_column, last_column + 1))
+                for row in range(first_row, last_row + 1)]
+
+
+def get_workbook_parts(xlsxFile: zipfile.ZipFile):
+    relations = ElementTree.fromstring(xlsxFile.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for relation in relations.iter(PACKAGE_RELATIONSHIPS_NS + 'Relationship'):
+        target = relation.get('Target')
+        targets[relation.get('Id')] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+    workbook = ElementTree.fromstring(xlsxFile.read('xl/workbook.xml'))
+    parts = {}
+    for sheet in workbook.iter(SPREADSHEET_NS + 'sheet'):
+        parts[sheet.get('name')] = targets[sheet.get(RELATIONSHIPS_NS + 'id')]
+    return parts
+
+
+def get_shared_strings(xlsxFile: zipfile.ZipFile):
+    if 'xl/sharedStrings.xml' not in xlsxFile.namelist():
+        return []
+    shared_strings = []
+    for _, element in ElementTree.iterparse(xlsxFile.open('xl/sharedStrings.xml')):
+        if element.tag == SPREADSHEET_NS + 'si':
+            # Plain strings hold a single <t>, rich text one <t> per run; phonetic <rPh> hints are left out
+            texts = (element.findall(SPREADSHEET_NS + 't') +
+                     element.findall(SPREADSHEET_NS + 'r/' + SPREADSHEET_NS + 't'))
+            shared_strings.append(''.join(text.text or '' for text in texts))
+            element.clear()
+    return shared_strings
+
+
+def read_xml_value(element, shared_strings: list):
+    data_type = element.get('t', 'n')
+    if data_type == 'inlineStr':
+        inline_string = element.find(SPREADSHEET_NS + 'is')
+        if inline_string is None:
+            return None
+        return ''.join(text.text or '' for text in inline_string.iter(SPREADSHEET_NS + 't'))
+    value = element.findtext(SPREADSHEET_NS + 'v')
+    if value is None:
+        return None
+    if data_type == 'n':
+        return float(value) if '.' in value or 'E' in value or 'e' in value else int(value)
+    elif data_type == 's':
+        return shared_strings[int(value)]
+    elif data_type == 'b':
+        return bool(int(value))
+    return value
+
+
+class XmlWorkbook:
+    def __init__(self, xlsxFilePath):
+        self.xlsxFile = zipfile.ZipFile(xlsxFilePath)
+        self.parts = get_workbook_parts(self.xlsxFile)
+        self.sheetnames = list(self.parts)
+        self.shared_strings = get_shared_strings(self.xlsxFile)
+
+    def __getitem__(self, sheetname):
+        return XmlWorksheet(self, sheetname)
+
+    def close(self):
+        self.xlsxFile.close()
+
+
+class XmlWorksheet:
+    def __init__(self, parent: XmlWorkbook, title: str):
+        self.parent = parent
+        self.title = title
+
+    def open(self):
+        return self.parent.xlsxFile.open(self.parent.parts[self.title])
+
+
+class XmlReader:
+    def __init__(self, ws: XmlWorksheet, last_row: int = SPAN_LAST_ROW, addresses: frozenset = None):
+        self.addresses = SPAN_ADDRESSES if addresses is None else addresses
+        self.values = {}
+        shared_strings = ws.parent.shared_strings
+        row = 0
+        cells = []
+        with ws.open() as sheetFile:
+            # Only end events are needed: cells are collected and resolved when their row closes
+            for _, element in ElementTree.iterparse(sheetFile):
+                if element.tag == SPREADSHEET_NS + 'c':
+                    cells.append(element)
+                elif element.tag == SPREADSHEET_NS + 'row':
+                    row = int(element.get('r', row + 1))
+                    column = 0
+                    for cell in cells:
+                        address = cell.get('r')
+                        if address is None:
+                            column += 1
+                            address = get_column_letter(column) + str(row)
+                        else:
+                            column = split_address(address)[1]
+                        if address in self.addresses:
+                            self.values[address] = read_xml_value(cell, shared_strings)
+                    cells = []
+                    element.clear()
+                    if row >= last_row:
+                        break
+
+    def __getitem__(self, address):
+        if address not in self.addresses:
+            raise KeyError("Cell {0} is not read by the xml engine".format(address))
+        return self.values.get(address)
+
+    def read_rows(self, first_row: int, last_row: int, first_column: int, last_column: int):
+        return [tuple(self.values.get(get_column_letter(column) + str(row))
+                      for column in range(first_column, last_column + 1))
+                for row in range(first_row, last_row + 1)]
+
+
+def open_workbook(xlsxFilePath, engine: str = 'grid'):
+    if engine == 'xml':
+        return XmlWorkbook(xlsxFilePath)
+    return openpyxl.load_workbook(xlsxFilePath, read_only=True, data_only=True, keep_vba=False)
+
+
+SPAN_READERS = {'cell': CellReader, 'grid': GridReader, 'xml': XmlReader}
+
+
+class CountingReader:
+    # Wraps a span reader and counts the cells read through it
+    def __init__(self, cells):
+        self.cells = cells
+        self.accesses = 0
+
+    def __getitem__(self, address):
+        self.accesses += 1
+        return self.cells[address]
+
+    def read_rows(self, first_row: int, last_row: int, first_column: int, last_column: int):
+        self.accesses += (last_row - first_row + 1) * (last_column - first_column + 1)
+        return self.cells.read_rows(first_row, last_row, first_column, last_column)
+
+
+def read_profiled_span_info(wb, index: int, engine: str):
+    start = time.perf_counter()
+    ws = wb[wb.sheetnames[index]]
+    cells = CountingReader(SPAN_READERS[engine](ws))
+    loaded = time.perf_counter()
+    span_info = read_span_info(ws.title, cells)
+    record = {'sheet': ws.title, 'start': start, 'loaded': loaded, 'end': time.perf_counter(),
+              'cell_accesses': cells.accesses, 'pid': os.getpid(), 'tid': threading.get_ident()}
+    return span_info, record
+
+
+def read_flags(cells, addresses):
+    flags = []
+    for address in addresses:
+        if isinstance(address, list):
+            flags.append(read_flags(cells, address))
+        elif address is False:
+            flags.append(False)
+        else:
+            flags.append(True if cells[address] else False)
+    return flags
+
+
+def read_span_info(span_name: str, cells):
+    span_keys = ['span_name', 'left_support_info', 'right_support_info', 'free_length', 'width', 'height',
+                 'bars_info', 'stirrups_info']
+    ls_info = [cells['L78'], cells['N78']]
+    rs_info = [cells['L80'], cells['N80']]
+    free_length = cells['L79']
+    width = cells['Q78'] / 100
+    height = cells['Q79'] / 100
+
+    bars_info = {'quantity': {
+        'top_left': 0,
+        'top_right': 0,
+        'bottom_left': 0,
+        'bottom_center': 0,
+        'bottom_right': 0},
+        'info': []}
+    bars_keys = ['label', 'case', 'side', 'order', 'left_cut', 'right_cut', 'tie_info']
+    for bar in BAR_CELLS:
+        (quantity_1, diameter_1), (quantity_2, diameter_2) = bar['bars']
+        if cells[quantity_1] == 0 and cells[quantity_2] == 0:
+            continue
+        label = ""
+        label_1 = str(cells[quantity_1]) + '%%C' + cells[diameter_1]
+        label_2 = str(cells[quantity_2]) + '%%C' + cells[diameter_2]
+        if cells[quantity_1] != 0:
+            label = label + label_1 + (' + ' if cells[quantity_2] != 0 else '')
+        if cells[quantity_2] != 0:
+            label = label + label_2
+        (left_1, left_2), left_reference = bar['left_cut']
+        (right_1, right_2), right_reference = bar['right_cut']
+        left_cut = [cells[left_1] - cells[left_reference],
+                    cells[left_2] - cells[left_reference]]
+        right_cut = [cells[right_1] - cells[right_reference],
+                     cells[right_2] - cells[right_reference]]
+        tie_info = [[label_1, label_2]] + read_flags(cells, bar['tie'])
+        if bar['quantity'] is not None:
+            bars_info['quantity'][bar['quantity']] += 1
+        bars_info['info'].append(dict(zip(bars_keys, [label, bar['case'], bar['side'], bar['order'], left_cut,
+                                                      right_cut, tie_info])))
+
+    stirrups_info = {'differentiate': cells['I414'], 'diameters': {
+        'l2r_diam': "%%C" + str(cells['L416']),
+        'r2l_diam': "%%C" + str(cells['L424'])},
+        'quantity': {
+        'l2r_two_legged': cells['I416'],
+        'l2r_single_legged': cells['J416'],
+        'r2l_two_legged': cells['I424'],
+        'r2l_single_legged': cells['J424']},
+        'text': "",
+        'info': []}
+
+    stirrups_text = str(cells['I416']) + ' (est. rect.) '
+    stirrups_text = stirrups_text + ('+ ' + str(cells['J416']) + ' (gancho) ' if cells['J416'] != 0 else '')
+    stirrups_text = stirrups_text + '%%C' + cells['L416'] + ': ' + cells['M431']
+    if not stirrups_info['differentiate']:
+        stirrups_text = stirrups_text + ' c/ext.'
+    else:
+        stirrups_text = stirrups_text + ' ----->    <----- '
+        stirrups_text = stirrups_text + str(cells['I424']) + ' (est. rect.) '
+        stirrups_text = stirrups_text + (
+            '+ ' + str(cells['J424']) + ' (gancho) ' if cells['J424'] != 0 else '')
+        stirrups_text = stirrups_text + '%%C' + cells['L424'] + ': ' + cells['U431']
+    stirrups_info['text'] = stirrups_text
+
+    stirrups_keys = ['side', 'quantity', 'spacing']
+    first_row, last_row = STIRRUP_ROWS['l2r'][0], STIRRUP_ROWS['r2l'][1]
+    block = cells.read_rows(first_row, last_row, *STIRRUP_COLUMNS)
+    for side, (zone_first_row, zone_last_row) in enumerate([STIRRUP_ROWS['l2r'], STIRRUP_ROWS['r2l']]):
+        for end_mark, quantity, _, spacing in block[zone_first_row - first_row:zone_last_row - first_row + 1]:
+            stirrups_info['info'].append(dict(zip(stirrups_keys, [side, quantity, spacing])))
+            if end_mark == 1:
+                break
+        else:
+            raise Exception("No stirrup zone end mark in column M, rows {0}-{1} of sheet '{2}'".format(
+                zone_first_row, zone_last_row, span_name))
+    return dict(zip(span_keys, [span_name, ls_info, rs_info, free_length, width, height, bars_info, stirrups_info]))
+
+
+def get_sheets_fingerprints(xlsxFilePath, sheetnames: list):
+    # Shared string indices may point elsewhere after a save, so the strings a sheet uses are hashed with its XML
+    with zipfile.ZipFile(xlsxFilePath) as xlsxFile:
+        parts = get_workbook_parts(xlsxFile)
+        shared_strings = get_shared_strings(xlsxFile)
+        fingerprints = {}
+        for sheetname in sheetnames:
+            sheet_xml = xlsxFile.read(parts[sheetname])
+            digest = hashlib.sha1(sheet_xml)
+            for string_index in SHARED_STRING_CELL.findall(sheet_xml):
+                digest.update(b'\0' + shared_strings[int(string_index)].encode())
+            fingerprints[sheetname] = digest.hexdigest()
+    return fingerprints
+
+
+BAR_QUANTITY_KEYS = ['top_left', 'top_right', 'bottom_left', 'bottom_center', 'bottom_right']
+
+
+class LongitudinalBar:
+    # Cuts are kept as one array [left_0, left_1, right_0, right_1]; int_cuts flags the entries that were ints
+    __slots__ = ('label', 'case', 'side', 'order', 'cuts', 'int_cuts', 'tie_info')
+
+    def __init__(self, label: str, case: int, side: int, order: int, left_cut: list, right_cut: list,
+                 tie_info: list):
+        self.label = label
+        self.case = case
+        self.side = side
+        self.order = order
+        self.cuts = array('d', list(left_cut) + list(right_cut))
+        self.int_cuts = sum(1 << i for i, cut in enumerate(list(left_cut) + list(right_cut)) if isinstance(cut, int))
+        self.tie_info = tie_info
+
+    @property
+    def left_cut(self):
+        return [self.get_cut(0), self.get_cut(1)]
+
+    @property
+    def right_cut(self):
+        return [self.get_cut(2), self.get_cut(3)]
+
+    def get_cut(self, i: int):
+        return int(self.cuts[i]) if self.int_cuts >> i & 1 else self.cuts[i]
+
+    @classmethod
+    def from_dict(cls, bar_data: dict):
+        return cls(bar_data['label'], bar_data['case'], bar_data['side'], bar_data['order'], bar_data['left_cut'],
+                   bar_data['right_cut'], bar_data['tie_info'])
+
+    def to_dict(self):
+        return {'label': self.label, 'case': self.case, 'side': self.side, 'order': self.order,
+                'left_cut': self.left_cut, 'right_cut': self.right_cut, 'tie_info': self.tie_info}
+
+
+class StirrupZone:
+    __slots__ = ('side', 'quantity', 'spacing')
+
+    def __init__(self, side: int, quantity, spacing):
+        self.side = side
+        self.quantity = quantity
+        self.spacing = spacing
+
+    @classmethod
+    def from_dict(cls, zone_data: dict):
+        return cls(zone_data['side'], zone_data['quantity'], zone_data['spacing'])
+
+    def to_dict(self):
+        return {'side': self.side, 'quantity': self.quantity, 'spacing': self.spacing}
+
+
+class Stirrups:
+    __slots__ = ('differentiate', 'l2r_diam', 'r2l_diam', 'l2r_two_legged', 'l2r_single_legged', 'r2l_two_legged',
+                 'r2l_single_legged', 'text', 'zones')
+
+    def __init__(self, differentiate, l2r_diam: str, r2l_diam: str, l2r_two_legged, l2r_single_legged,
+                 r2l_two_legged, r2l_single_legged, text: str, zones: list):
+        self.differentiate = differentiate
+        self.l2r_diam = l2r_diam
+        self.r2l_diam = r2l_diam
+        self.l2r_two_legged = l2r_two_legged
+        self.l2r_single_legged = l2r_single_legged
+        self.r2l_two_legged = r2l_two_legged
+        self.r2l_single_legged = r2l_single_legged
+        self.text = text
+        self.zones = zones
+
+    @classmethod
+    def from_dict(cls, stirrups_info: dict):
+        diameters, quantity = stirrups_info['diameters'], stirrups_info['quantity']
+        return cls(stirrups_info['differentiate'], diameters['l2r_diam'], diameters['r2l_diam'],
+                   quantity['l2r_two_legged'], quantity['l2r_single_legged'], quantity['r2l_two_legged'],
+                   quantity['r2l_single_legged'], stirrups_info['text'],
+                   [StirrupZone.from_dict(zone_data) for zone_data in stirrups_info['info']])
+
+    def to_dict(self):
+        return {'differentiate': self.differentiate,
+                'diameters': {'l2r_diam': self.l2r_diam, 'r2l_diam': self.r2l_diam},
+                'quantity': {'l2r_two_legged': self.l2r_two_legged, 'l2r_single_legged': self.l2r_single_legged,
+                             'r2l_two_legged': self.r2l_two_legged, 'r2l_single_legged': self.r2l_single_legged},
+                'text': self.text,
+                'info': [zone.to_dict() for zone in self.zones]}
+
+
+class Span:
+    __slots__ = ('span_name', 'left_support_width', 'left_support_flag', 'right_support_width', 'right_support_flag',
+                 'free_length', 'width', 'height', 'bar_quantity', 'bars', 'stirrups')
+
+    def __init__(self, span_name: str, left_support_info: list, right_support_info: list, free_length: float,
+                 width: float, height: float, bar_quantity: list, bars: list, stirrups: Stirrups):
+        self.span_name = span_name
+        self.left_support_width, self.left_support_flag = left_support_info
+        self.right_support_width, self.right_support_flag = right_support_info
+        self.free_length = free_length
+        self.width = width
+        self.height = height
+        self.bar_quantity = bar_quantity
+        self.bars = bars
+        self.stirrups = stirrups
+
+    @property
+    def left_support_info(self):
+        return [self.left_support_width, self.left_support_flag]
+
+    @property
+    def right_support_info(self):
+        return [self.right_support_width, self.right_support_flag]
+
+    @classmethod
+    def from_dict(cls, span_info: dict):
+        bars_info = span_info['bars_info']
+        return cls(span_info['span_name'], span_info['left_support_info'], span_info['right_support_info'],
+                   span_info['free_length'], span_info['width'], span_info['height'],
+                   [bars_info['quantity'][key] for key in BAR_QUANTITY_KEYS],
+                   [LongitudinalBar.from_dict(bar_data) for bar_data in bars_info['info']],
+                   Stirrups.from_dict(span_info['stirrups_info']))
+
+    def to_dict(self):
+        return {'span_name': self.span_name, 'left_support_info': self.left_support_info,
+                'right_support_info': self.right_support_info, 'free_length': self.free_length,
+                'width': self.width, 'height': self.height,
+                'bars_info': {'quantity': dict(zip(BAR_QUANTITY_KEYS, self.bar_quantity)),
+                              'info': [bar.to_dict() for bar in self.bars]},
+                'stirrups_info': self.stirrups.to_dict()}
+
+
+class Beam:
+    __slots__ = ('beam_name', 'spans')
+
+    def __init__(self, beam_name: str, spans: list):
+        self.beam_name = beam_name
+        self.spans = spans
+
+    @property
+    def spans_num(self):
+        return len(self.spans)
+
+    @classmethod
+    def from_dict(cls, beam_info: dict):
+        return cls(beam_info['beam_name'], [Span.from_dict(span_info) for span_info in beam_info['spans_info']])
+
+    def to_dict(self):
+        return {'beam_name': self.beam_name, 'spans_num': self.spans_num,
+                'spans_info': [span.to_dict() for span in self.spans]}
+
+
+def download_workbook_spans_info(xlsxFilePath, engine: str, indices: list, profile: bool = False):
+    start = time.perf_counter()
+    wb = open_workbook(xlsxFilePath, engine)
+    try:
+        if not profile:
+            spans_info = []
+            for index in indices:
+                ws = wb[wb.sheetnames[index]]
+                spans_info.append(read_span_info(ws.title, SPAN_READERS[engine](ws)))
+            return spans_info
+        # Profiled runs also send back their timings, which the parent adds to its trace
+        load = {'start': start, 'end': time.perf_counter(), 'pid': os.getpid(), 'tid': threading.get_ident()}
+        spans_info, records = [], []
+        for index in indices:
+            span_info, record = read_profiled_span_info(wb, index, engine)
+            spans_info.append(span_info)
+            records.append(record)
+        return spans_info, load, records
+    finally:
+        wb.close()
+
+
+def get_umask() -> int:
+    # The umask can only be read by setting it, so it is set straight back
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def write_file_atomically(fileName: str, write, mode: str = 'w'):
+    # Write to a temporary file in the same directory and swap it in, so readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(fileName))
+    fd, tempName = tempfile.mkstemp(prefix='.' + os.path.basename(fileName) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as tempFile:
+            write(tempFile)
+        # mkstemp creates the file 0600; give it the mode the target has, or the one open() would have given it
+        if os.path.exists(fileName):
+            shutil.copymode(fileName, tempName)
+        else:
+            os.chmod(tempName, 0o666 & ~get_umask())
+        os.replace(tempName, fileName)
+    except BaseException:
+        os.remove(tempName)
+        raise
+    return os.path.getsize(fileName)
+
+
+# Directory, next to the stores, that holds their lock files. The files stay after release: removing a lock file
+# while another process waits on it would let two writers in at once
+LOCKS_DIRECTORY = '.locks'
+
+
+def get_lock_file_name(fileName: str) -> str:
+    directory = os.path.join(os.path.dirname(os.path.abspath(fileName)), LOCKS_DIRECTORY)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(fileName) + '.lock')
+
+
+class FileLock:
+    # Advisory lock on a side file so that writers of the same store, in any process, take turns.
+    # Re-entrant for the object that holds it, which lets a batch wrap the store's own locked writes
+    def __init__(self, fileName: str):
+        self.fileName = fileName
+        self.thread_lock = threading.RLock()
+        self.lockFile = None
+        self.depth = 0
+
+    def acquire(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            lockFile = open(self.fileName, 'a')
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX)
+                elif msvcrt is not None:
+                    while True:
+                        try:
+                            # LK_LOCK gives up after about 10 seconds; keep waiting like flock does
+                            msvcrt.locking(lockFile.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            pass
+            except BaseException:
+                lockFile.close()
+                self.thread_lock.release()
+                raise
+            self.lockFile = lockFile
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self.lockFile.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self.lockFile.seek(0)
+                msvcrt.locking(self.lockFile.fileno(), msvcrt.LK_UNLCK, 1)
+            self.lockFile.close()
+            self.lockFile = None
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def new_io_counter():
+    return {'reads': 0, 'writes': 0, 'read_bytes': 0, 'written_bytes': 0}
+
+
+def build_json_index(text: str):
+    # text is the file decoded as latin-1, so string positions are byte offsets into the file
+    decoder = json.JSONDecoder()
+    offsets = {}
+    position = JSON_WHITESPACE.match(text, 0).end()
+    if text[position:position + 1] != '{':
+        raise Exception("Top-level JSON object expected")
+    position = JSON_WHITESPACE.match(text, position + 1).end()
+    while text[position:position + 1] != '}':
+        if text[position:position + 1] != '"':
+            raise Exception("Invalid JSON key at offset {0}".format(position))
+        key, position = scanstring(text, position + 1)
+        try:
+            key = key.encode('latin-1').decode('utf-8')
+        except UnicodeError:
+            pass
+        position = JSON_WHITESPACE.match(text, position).end()
+        if text[position:position + 1] != ':':
+            raise Exception("Invalid JSON object at offset {0}".format(position))
+        start = JSON_WHITESPACE.match(text, position + 1).end()
+        _, position = decoder.raw_decode(text, start)
+        offsets[key] = [start, position]
+        position = JSON_WHITESPACE.match(text, position).end()
+        if text[position:position + 1] == ',':
+            position = JSON_WHITESPACE.match(text, position + 1).end()
+    return offsets
+
+
+class JsonIndex:
+    # Random access to the top-level entries of a JSON object file through a cached table of byte offsets. The file
+    # is opened for each read and closed right after it, since Windows cannot replace a file that is held open
+    def __init__(self, fileName: str):
+        self.fileName = fileName
+        self.indexFileName = fileName + '.index'
+        with open(fileName, 'rb') as jsonFile:
+            self.load(jsonFile)
+
+    def load(self, jsonFile):
+        self.stat = os.fstat(jsonFile.fileno())
+        self.offsets = self.load_offsets()
+        if self.offsets is None:
+            jsonFile.seek(0)
+            self.offsets = build_json_index(jsonFile.read().decode('latin-1'))
+            self.dump_offsets(self.indexFileName, self.offsets, self.stat)
+
+    def load_offsets(self):
+        try:
+            with open(self.indexFileName) as indexFile:
+                index = json.load(indexFile)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if index.get('size') != self.stat.st_size or index.get('mtime_ns') != self.stat.st_mtime_ns:
+            return None
+        return index['offsets']
+
+    @staticmethod
+    def dump_offsets(indexFileName: str, offsets: dict, stat):
+        index = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'offsets': offsets}
+        try:
+            write_file_atomically(indexFileName, lambda indexFile: json.dump(index, indexFile))
+        except OSError:
+            pass
+
+    def is_changed(self, stat):
+        return stat.st_size != self.stat.st_size or stat.st_mtime_ns != self.stat.st_mtime_ns
+
+    def is_stale(self):
+        try:
+            return self.is_changed(os.stat(self.fileName))
+        except FileNotFoundError:
+            return True
+
+    def __getitem__(self, key):
+        with open(self.fileName, 'rb') as jsonFile:
+            if self.is_changed(os.fstat(jsonFile.fileno())):
+                # Replaced since the offsets were taken, so they are taken again from the file now read
+                self.load(jsonFile)
+            start, end = self.offsets[key]
+            jsonFile.seek(start)
+            return json.loads(jsonFile.read(end - start))
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def get_size(self, key):
+        start, end = self.offsets[key]
+        return end - start
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def keys(self):
+        return self.offsets.keys()
+
+    def items(self):
+        for key in list(self.offsets):
+            try:
+                value = self[key]
+            except KeyError:
+                # Dropped by a writer while iterating
+                continue
+            yield key, value
+
+
+class JsonStore:
+    def __init__(self, fileName: str, io_counter: dict = None, indexed: bool = True):
+        self.fileName = fileName
+        self.io_counter = new_io_counter() if io_counter is None else io_counter
+        self.indexed = indexed
+        self.index = None
+        self.lock = FileLock(get_lock_file_name(fileName))
+        # Inside a batch the values live in pending and are written once when the batch ends
+        self.in_batch = False
+        self.pending = None
+
+    @contextmanager
+    def batch(self):
+        if self.in_batch:
+            yield
+            return
+        with self.lock:
+            try:
+                self.pending = self.load_values()
+            except FileNotFoundError:
+                self.pending = {}
+            self.in_batch = True
+            try:
+                yield
+                dictionary = self.pending
+            finally:
+                self.in_batch = False
+                self.pending = None
+            self.write_values(dictionary)
+
+    def load_values(self):
+        if self.in_batch:
+            return self.pending
+        with open(self.fileName) as jsonFile:
+            dictionary = json.load(jsonFile)
+            self.io_counter['read_bytes'] += os.fstat(jsonFile.fileno()).st_size
+        self.io_counter['reads'] += 1
+        return dictionary
+
+    def dump_values(self, dictionary):
+        if self.in_batch:
+            self.pending = dictionary
+            return
+        with self.lock:
+            self.write_values(dictionary)
+
+    def write_values(self, dictionary):
+        self.close()
+        if not self.indexed or not isinstance(dictionary, dict) or \
+                not all(isinstance(key, str) for key in dictionary):
+            self.io_counter['written_bytes'] += write_file_atomically(
+                self.fileName, lambda jsonFile: json.dump(dictionary, jsonFile))
+            self.io_counter['writes'] += 1
+            return
+        # Encode entry by entry (same bytes as json.dump) so the offset index comes for free
+        offsets = {}
+        chunks = []
+        position = 1
+        for key, value in dictionary.items():
+            chunk = json.dumps(key) + ': '
+            start = position + (2 if chunks else 0) + len(chunk)
+            chunk = chunk + json.dumps(value)
+            position = position + (2 if chunks else 0) + len(chunk)
+            offsets[key] = [start, position]
+            chunks.append(chunk)
+        self.io_counter['written_bytes'] += write_file_atomically(
+            self.fileName, lambda jsonFile: jsonFile.write('{' + ', '.join(chunks) + '}'))
+        JsonIndex.dump_offsets(self.fileName + '.index', offsets, os.stat(self.fileName))
+        self.io_counter['writes'] += 1
+
+    def open_index(self):
+        if self.index is None or self.index.is_stale():
+            self.close()
+            self.index = JsonIndex(self.fileName)
+        return self.index
+
+    def get_variable_value(self, variable):
+        if not self.indexed or self.in_batch:
+            return self.load_values()[variable]
+        index = self.open_index()
+        value = index[variable]
+        self.io_counter['reads'] += 1
+        self.io_counter['read_bytes'] += index.get_size(variable)
+        return value
+
+    def iter_values(self):
+        if self.in_batch:
+            yield from list(self.pending.items())
+            return
+        index = self.open_index()
+        for variable, value in index.items():
+            self.io_counter['reads'] += 1
+            self.io_counter['read_bytes'] += index.get_size(variable)
+            yield variable, value
+
+    def set_variable_value(self, variable, value):
+        # Read, change and write under the lock so a concurrent writer's update is not lost
+        with self.lock:
+            dictionary = self.load_values()
+            dictionary[variable] = value
+            self.dump_values(dictionary)
+
+    def set_default_variable(self, key, value):
+        with self.lock:
+            dictionary = self.load_values()
+            dictionary.setdefault(str(key), value)
+            self.dump_values(dictionary)
+
+    def reset_values(self):
+        # Every store starts empty, whatever its file is called
+        self.dump_values({})
+
+    def remove(self):
+        self.close()
+        for fileName in [self.fileName, self.fileName + '.index']:
+            if os.path.exists(fileName):
+                os.remove(fileName)
+
+    def close(self):
+        self.index = None
+
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+class SqliteStore:
+    # Each top-level value is a row of beams in insertion order. When it carries a 'spans_info' list the spans are
+    # kept one per row in spans and the beam row stores the rest of the dict with a null placeholder for them
+    def __init__(self, fileName: str, io_counter: dict = None):
+        self.fileName = fileName
+        self.io_counter = new_io_counter() if io_counter is None else io_counter
+        if os.path.exists(fileName) and os.path.getsize(fileName):
+            with open(fileName, 'rb') as storeFile:
+                if storeFile.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+                    raise Exception("{0} is not a SQLite store (a JSON store?), choose another file name".format(
+                        fileName))
+        self.connection = sqlite3.connect(fileName, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.in_batch = False
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS beams (
+                    beam_name TEXT PRIMARY KEY, position INTEGER, storey TEXT, number TEXT, info TEXT);
+                CREATE TABLE IF NOT EXISTS spans (
+                    beam_name TEXT, span_index INTEGER, span_name TEXT, info TEXT,
+                    PRIMARY KEY (beam_name, span_index));
+                CREATE INDEX IF NOT EXISTS beams_storey ON beams (storey);
+                CREATE INDEX IF NOT EXISTS beams_number ON beams (number);
+                CREATE INDEX IF NOT EXISTS beams_position ON beams (position);
+            """)
+
+    @contextmanager
+    def batch(self):
+        if self.in_batch:
+            yield
+            return
+        # Take the write lock up front; a deferred transaction that upgrades later can fail with SQLITE_BUSY
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.in_batch = True
+        try:
+            yield
+        except BaseException:
+            self.connection.rollback()
+            raise
+        else:
+            self.connection.commit()
+        finally:
+            self.in_batch = False
+
+    def load_values(self):
+        spans = {}
+        size = 0
+        for beam_name, span_info in self.connection.execute(
+                "SELECT beam_name, info FROM spans ORDER BY beam_name, span_index"):
+            spans.setdefault(beam_name, []).append(json.loads(span_info))
+            size += len(span_info)
+        dictionary = {}
+        for beam_name, beam_info in self.connection.execute("SELECT beam_name, info FROM beams ORDER BY position"):
+            dictionary[beam_name] = self.decode_beam(beam_name, beam_info, spans)
+            size += len(beam_info)
+        self.io_counter['reads'] += 1
+        self.io_counter['read_bytes'] += size
+        return dictionary
+
+    def dump_values(self, dictionary):
+        with self.batch():
+            self.connection.execute("DELETE FROM spans")
+            self.connection.execute("DELETE FROM beams")
+            for position, (variable, value) in enumerate((dictionary or {}).items()):
+                self.insert_beam(variable, value, position)
+        self.io_counter['writes'] += 1
+
+    def get_variable_value(self, variable):
+        row = self.connection.execute("SELECT info FROM beams WHERE beam_name = ?", (variable,)).fetchone()
+        if row is None:
+            raise KeyError(variable)
+        span_rows = self.connection.execute(
+            "SELECT info FROM spans WHERE beam_name = ? ORDER BY span_index", (variable,)).fetchall()
+        spans = {variable: [json.loads(span_info) for span_info, in span_rows]}
+        self.io_counter['reads'] += 1
+        self.io_counter['read_bytes'] += len(row[0]) + sum(len(span_info) for span_info, in span_rows)
+        return self.decode_beam(variable, row[0], spans)
+
+    def set_variable_value(self, variable, value):
+        with self.batch():
+            row = self.connection.execute("SELECT position FROM beams WHERE beam_name = ?", (variable,)).fetchone()
+            position = row[0] if row is not None else self.next_position()
+            self.connection.execute("DELETE FROM spans WHERE beam_name = ?", (variable,))
+            self.insert_beam(variable, value, position)
+        self.io_counter['writes'] += 1
+
+    def set_default_variable(self, key, value):
+        with self.batch():
+            if self.connection.execute("SELECT 1 FROM beams WHERE beam_name = ?", (str(key),)).fetchone() is None:
+                self.insert_beam(str(key), value, self.next_position())
+        self.io_counter['writes'] += 1
+
+    def iter_values(self):
+        for beam_name, in self.connection.execute("SELECT beam_name FROM beams ORDER BY position").fetchall():
+            yield beam_name, self.get_variable_value(beam_name)
+
+    def reset_values(self):
+        self.dump_values({})
+
+    def get_storey_beams(self, storey: str):
+        return [beam_name for beam_name, in self.connection.execute(
+            "SELECT beam_name FROM beams WHERE storey = ? ORDER BY position", (storey,))]
+
+    def export_json(self, fileName: str):
+        JsonStore(fileName, self.io_counter).dump_values(self.load_values())
+
+    def next_position(self):
+        return self.connection.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM beams").fetchone()[0]
+
+    def insert_beam(self, variable, value, position: int):
+        try:
+            storey, number = split_span_name(variable)
+        except IndexError:
+            storey, number = None, None
+        if isinstance(value, dict) and isinstance(value.get('spans_info'), list):
+            spans = [(variable, span_index, span_info.get('span_name') if isinstance(span_info, dict) else None,
+                      json.dumps(span_info)) for span_index, span_info in enumerate(value['spans_info'])]
+            self.connection.executemany(
+                "INSERT INTO spans (beam_name, span_index, span_name, info) VALUES (?, ?, ?, ?)", spans)
+            self.io_counter['written_bytes'] += sum(len(span[3]) for span in spans)
+            value = dict(value, spans_info=None)
+        beam_info = json.dumps(value)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO beams (beam_name, position, storey, number, info) VALUES (?, ?, ?, ?, ?)",
+            (variable, position, storey, number, beam_info))
+        self.io_counter['written_bytes'] += len(beam_info)
+
+    @staticmethod
+    def decode_beam(beam_name, beam_info, spans: dict):
+        value = json.loads(beam_info)
+        if isinstance(value, dict) and 'spans_info' in value and value['spans_info'] is None:
+            value['spans_info'] = spans.get(beam_name, [])
+        return value
+
+    def close(self):
+        self.connection.close()
+
+
+STORES = {'json': JsonStore, 'sqlite': SqliteStore}
+# Store used when Assistant is given no file name; each kind has its own so neither opens the other's file
+DEFAULT_STORE_NAMES = {'json': 'Beams_info', 'sqlite': 'Beams_info.sqlite'}
+
+
+def canonicalize(value):
+    # Names are left out and numbers rounded, so spans that only differ by float noise hash the same
+    if isinstance(value, dict):
+        return {key: canonicalize(item) for key, item in value.items() if key != 'span_name'}
+    elif isinstance(value, list):
+        return [canonicalize(item) for item in value]
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(float(value), 6) + 0.0
+    return value
+
+
+def get_content_hash(value):
+    return hashlib.sha1(json.dumps(canonicalize(value), sort_keys=True).encode()).hexdigest()
+
+
+def deduplicate_beams(beams_info: dict):
+    spans = {}
+    beams = {}
+    for beam_name, beam_info in beams_info.items():
+        span_hashes = []
+        for span_info in beam_info['spans_info']:
+            span_hash = get_content_hash(span_info)
+            if span_hash not in spans:
+                spans[span_hash] = {key: value for key, value in span_info.items() if key != 'span_name'}
+            span_hashes.append(span_hash)
+        beam_hash = hashlib.sha1(' '.join(span_hashes).encode()).hexdigest()
+        typical_beam = beams.setdefault(beam_hash, {'beam_names': [], 'span_names': [], 'spans': span_hashes})
+        typical_beam['beam_names'].append(beam_name)
+        typical_beam['span_names'].append([span_info['span_name'] for span_info in beam_info['spans_info']])
+    return {'spans': spans, 'beams': beams}
+
+
+def get_typical_beam_info(typical_beams: dict, beam_hash: str, copy: int = 0):
+    typical_beam = typical_beams['beams'][beam_hash]
+    spans_info = [dict({'span_name': span_name}, **typical_beams['spans'][span_hash])
+                  for span_name, span_hash in zip(typical_beam['span_names'][copy], typical_beam['spans'])]
+    return {'beam_name': typical_beam['beam_names'][copy], 'spans_num': len(spans_info), 'spans_info': spans_info}
+
+
+def expand_typical_beams(typical_beams: dict):
+    beams_info = {}
+    for beam_hash, typical_beam in typical_beams['beams'].items():
+        for copy, beam_name in enumerate(typical_beam['beam_names']):
+            beams_info[beam_name] = get_typical_beam_info(typical_beams, beam_hash, copy)
+    return beams_info
+
+
+class BeamsCatalog:
+    # Storey -> beam -> span names, plus lookups by section, free length and bar label, all in sheet order
+    def __init__(self):
+        self.storeys = {}
+        self.beams = {}
+        self.spans = {}
+        self.sections = {}
+        self.labels = {}
+        # (free_length, order, span_name) of the spans with a numeric free length; a blank L79 has none to sort by
+        self.lengths = []
+        self.added = 0
+
+    def add_length(self, free_length, span_name: str):
+        if isinstance(free_length, (int, float)):
+            bisect.insort(self.lengths, (free_length, self.added, span_name))
+        self.added += 1
+
+    def add_span(self, beam_name: str, beam_storey: str, span_info: dict):
+        span_name = span_info['span_name']
+        self.storeys.setdefault(beam_storey, {}).setdefault(beam_name, []).append(span_name)
+        self.beams[beam_name] = beam_storey
+        labels = []
+        for bar_data in span_info['bars_info']['info']:
+            for label in [bar_data['label']] + bar_data['label'].split(' + '):
+                if label not in labels:
+                    labels.append(label)
+                    self.labels.setdefault(label, []).append(span_name)
+        self.spans[span_name] = {'beam_name': beam_name, 'storey': beam_storey, 'width': span_info['width'],
+                                 'height': span_info['height'], 'free_length': span_info['free_length'],
+                                 'labels': labels}
+        self.sections.setdefault((span_info['width'], span_info['height']), []).append(span_name)
+        self.add_length(span_info['free_length'], span_name)
+
+    @classmethod
+    def from_beams(cls, beams):
+        catalog = cls()
+        for beam_name, beam_info in beams:
+            for span_info in beam_info['spans_info']:
+                catalog.add_span(beam_name, split_span_name(span_info['span_name'])[0], span_info)
+        return catalog
+
+    def get_storeys(self):
+        return list(self.storeys)
+
+    def get_beams(self, storey: str = None):
+        if storey is None:
+            return [beam_name for beams in self.storeys.values() for beam_name in beams]
+        return list(self.storeys.get(storey, {}))
+
+    def get_spans(self, beam_name: str):
+        storey = self.beams.get(beam_name)
+        return [] if storey is None else list(self.storeys[storey][beam_name])
+
+    def query(self, storey: str = None, width: float = None, height: float = None, min_length: float = None,
+              max_length: float = None, label: str = None):
+        candidates = []
+        if storey is not None:
+            candidates.append({span_name for spans in self.storeys.get(storey, {}).values() for span_name in spans})
+        if width is not None or height is not None:
+            candidates.append({span_name for (section_width, section_height), spans in self.sections.items()
+                               if (width is None or section_width == width) and
+                               (height is None or section_height == height) for span_name in spans})
+        if min_length is not None or max_length is not None:
+            first = 0 if min_length is None else bisect.bisect_left(self.lengths, (min_length,))
+            last = len(self.lengths) if max_length is None else \
+                bisect.bisect_right(self.lengths, (max_length, math.inf))
+            candidates.append({span_name for _, _, span_name in self.lengths[first:last]})
+        if label is not None:
+            candidates.append(set(self.labels.get(label, [])))
+        if not candidates:
+            return list(self.spans)
+        selection = set.intersection(*sorted(candidates, key=len))
+        return [span_name for span_name in self.spans if span_name in selection]
+
+    def to_dict(self):
+        return {'storeys': self.storeys, 'spans': self.spans,
+                'sections': [[width, height, spans] for (width, height), spans in self.sections.items()],
+                'labels': self.labels}
+
+    @classmethod
+    def from_dict(cls, dictionary: dict):
+        catalog = cls()
+        catalog.storeys = dictionary['storeys']
+        catalog.beams = {beam_name: storey for storey, beams in catalog.storeys.items() for beam_name in beams}
+        catalog.spans = dictionary['spans']
+        catalog.sections = {(width, height): spans for width, height, spans in dictionary['sections']}
+        catalog.labels = dictionary['labels']
+        for span_name, span in catalog.spans.items():
+            catalog.add_length(span['free_length'], span_name)
+        return catalog
+
+
+class IngestProfiler:
+    # Timings of an ingest run, kept as Chrome trace events (open the trace in chrome://tracing or Perfetto)
+    def __init__(self, io_counter: dict):
+        self.io_counter = io_counter
+        self.origin = time.perf_counter()
+        self.events = []
+        self.sheets = []
+
+    def add_event(self, name: str, category: str, start: float, end: float, pid: int = None, tid: int = None,
+                  **args):
+        self.events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': (start - self.origin) * 1e6,
+                            'dur': (end - start) * 1e6, 'pid': os.getpid() if pid is None else pid,
+                            'tid': threading.get_ident() if tid is None else tid, 'args': args})
+
+    @contextmanager
+    def measure(self, name: str, category: str, **args):
+        io_before = dict(self.io_counter)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            args.update({key: value - io_before[key] for key, value in self.io_counter.items()
+                         if value != io_before[key]})
+            self.add_event(name, category, start, end, **args)
+
+    def add_sheet(self, record: dict):
+        self.sheets.append(record)
+        self.add_event(record['sheet'], 'sheet', record['start'], record['end'], record['pid'], record['tid'],
+                       load_seconds=record['loaded'] - record['start'], cell_accesses=record['cell_accesses'])
+
+    def add_worker_load(self, load: dict):
+        self.add_event('load_workbook', 'workbook', load['start'], load['end'], load['pid'], load['tid'])
+
+    def get_total(self, category: str = None, name: str = None):
+        return sum(event['dur'] for event in self.events if (category is None or event['cat'] == category) and
+                   (name is None or event['name'] == name)) / 1e6
+
+    def summary(self, slowest: int = 5):
+        sheets_num = len(self.sheets)
+        sheets_seconds = [record['end'] - record['start'] for record in self.sheets]
+        lines = ['Ingest profile',
+                 '  load_workbook     {0:9.3f} s'.format(self.get_total('workbook', 'load_workbook')),
+                 '  sheets            {0:9d}    {1:9.3f} s  ({2:.2f} ms/sheet)'.format(
+                     sheets_num, sum(sheets_seconds), 1000 * sum(sheets_seconds) / max(sheets_num, 1)),
+                 '    sheet loading   {0:9.3f} s'.format(sum(record['loaded'] - record['start']
+                                                              for record in self.sheets)),
+                 '    cell accesses   {0:9d}'.format(sum(record['cell_accesses'] for record in self.sheets)),
+                 '  store I/O         {0:9.3f} s'.format(self.get_total('store')),
+                 '    reads           {0:9d}    {1:9d} bytes'.format(self.io_counter['reads'],
+                                                                      self.io_counter['read_bytes']),
+                 '    writes          {0:9d}    {1:9d} bytes'.format(self.io_counter['writes'],
+                                                                      self.io_counter['written_bytes'])]
+        if self.events:
+            lines.append('  wall time         {0:9.3f} s'.format(
+                max(event['ts'] + event['dur'] for event in self.events) / 1e6))
+        if self.sheets:
+            lines.append('  slowest sheets')
+            for seconds, record in sorted(zip(sheets_seconds, self.sheets), key=lambda item: -item[0])[:slowest]:
+                lines.append('    {0:<16}{1:9.2f} ms  {2} cells'.format(record['sheet'], 1000 * seconds,
+                                                                         record['cell_accesses']))
+        return '\n'.join(lines)
+
+    def dump_trace(self, traceFileName: str):
+        trace = {'traceEvents': self.events, 'displayTimeUnit': 'ms', 'otherData': dict(self.io_counter)}
+        write_file_atomically(traceFileName, lambda traceFile: json.dump(trace, traceFile))
 
 
 class Assistant:
-    def __init__(self, jsonFileName='Beams_info', xlsxFilePath=None):
+    def __init__(self, jsonFileName=None, xlsxFilePath=None, engine: str = 'grid', store: str = 'json',
+                 profile: bool = False, traceFileName: str = None):
+        if engine not in SPAN_READERS:
+            raise Exception("Invalid engine option ({0})".format(engine))
+        if store not in STORES:
+            raise Exception("Invalid store option ({0})".format(store))
+        if jsonFileName is None:
+            jsonFileName = DEFAULT_STORE_NAMES[store]
         self.fileName = jsonFileName
+        self.engine = engine
+        self.io_counter = new_io_counter()
+        # Profiling is off unless asked for; every hook below is then a single None check
+        self.profiler = IngestProfiler(self.io_counter) if profile or traceFileName is not None else None
+        self.traceFileName = traceFileName
+        # Ingest runs started on this instance; the first profile also covers the workbook load above
+        self.runs = 0
+        self.store = STORES[store](jsonFileName, self.io_counter)
+        self.fingerprints = JsonStore(jsonFileName + '.sheets', self.io_counter, indexed=False)
+        self.catalog = JsonStore(jsonFileName + '.catalog', self.io_counter, indexed=False)
+        self.typical = JsonStore(jsonFileName + '.typical', self.io_counter, indexed=False)
+        # Workbook each beam of the store was ingested from
+        self.sources = JsonStore(jsonFileName + '.sources', self.io_counter, indexed=False)
         if xlsxFilePath is None:
+            # Imported here so that headless runs never load tkinter
+            from tkinter import filedialog
             xlsxFilePath = filedialog.askopenfilename(filetypes=(("Excel files", "*xlsx"), ("Excel files", "*xlsm")))
-        self.wb = openpyxl.load_workbook(xlsxFilePath, read_only=True, data_only=True, keep_vba=False)
+        self.filePath = xlsxFilePath
+        with self.measure('load_workbook', 'workbook'):
+            self.wb = open_workbook(xlsxFilePath, engine)
+
+    def measure(self, name: str, category: str, **args):
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.measure(name, category, **args)
+
+    def start_profile(self):
+        # Every ingest reports on itself alone, not on the runs before it
+        if self.profiler is not None and self.runs:
+            for key in self.io_counter:
+                self.io_counter[key] = 0
+            self.profiler = IngestProfiler(self.io_counter)
+        self.runs += 1
+
+    def report_profile(self):
+        if self.profiler is None:
+            return
+        print(self.profiler.summary())
+        if self.traceFileName is not None:
+            self.profiler.dump_trace(self.traceFileName)
+
+    def load_values(self):
+        return self.store.load_values()
+
+    def dump_values(self, dictionary):
+        self.store.dump_values(dictionary)
 
     def get_variable_value(self, variable):
-        with open(self.fileName) as jsonFile:
-            dictionary = json.load(jsonFile)
-            value = dictionary[variable]
-        return value
+        return self.store.get_variable_value(variable)
 
     def set_variable_value(self, variable, value):
-        with open(self.fileName) as jsonFile:
-            dictionary = json.load(jsonFile)
-        with open(self.fileName, 'w') as jsonFile:
-            dictionary[variable] = value
-            json.dump(dictionary, jsonFile)
+        self.store.set_variable_value(variable, value)
 
     def set_default_variable(self, key, value):
-        with open(self.fileName) as jsonFile:
-            dictionary = json.load(jsonFile)
-        dictionary.setdefault(str(key), value)
-        with open(self.fileName, 'w') as jsonFile:
-            json.dump(dictionary, jsonFile)
+        self.store.set_default_variable(key, value)
 
     def reset_values(self):
-        default_values = {
-            "Beams_info": {}
-        }
-        dictionary = default_values.get(self.fileName)
-        with open(self.fileName, 'w') as jsonFile:
-            json.dump(dictionary, jsonFile)
-
-    def download_excel_beams_info(self, star_index: int = 6, last_index: int = None):
-        storey_beam_numbers = {}
-        self.reset_values()
-        for index in range(star_index, (len(self.wb.sheetnames) if last_index is None else last_index)):
-            span_info = self.download_excel_span_info(index)
-            beam_storey = re.findall('V(.+?)-', span_info['span_name'])[0]
+        self.store.reset_values()
+
+    def batch(self):
+        # Updates made inside "with assistant.batch():" hold the store lock and are written once at the end
+        return self.store.batch()
+
+    def get_catalog(self):
+        return BeamsCatalog.from_dict(self.catalog.load_values())
+
+    def iter_typical_beams(self):
+        typical_beams = self.typical.load_values()
+        for beam_hash, typical_beam in typical_beams['beams'].items():
+            yield typical_beam['beam_names'], get_typical_beam_info(typical_beams, beam_hash)
+
+    def get_sources(self):
+        try:
+            return self.sources.load_values()
+        except FileNotFoundError:
+            return {}
+
+    def claim_beams(self, beam_names, stored_names):
+        # A merge only replaces beams this workbook put there; a name already taken by another workbook is an error
+        source = os.path.abspath(self.filePath)
+        sources = self.get_sources()
+        collisions = sorted(beam_name for beam_name in beam_names if sources.get(beam_name, source) != source)
+        if collisions:
+            raise Exception("Beams {0} of {1} are already in {2} from another workbook, merge them with a prefix"
+                            .format(', '.join(name.strip() for name in collisions), self.filePath, self.fileName))
+        unknown = sorted(beam_name for beam_name in beam_names
+                         if beam_name in stored_names and beam_name not in sources)
+        if unknown:
+            print("Warning: replacing beams {0} of unknown workbook in {1}".format(
+                ', '.join(name.strip() for name in unknown), self.fileName))
+        sources.update(dict.fromkeys(beam_names, source))
+        return sources
+
+    def get_beam(self, beam_name: str):
+        return Beam.from_dict(self.get_variable_value(beam_name))
+
+    def iter_beams(self):
+        for beam_name, beam_info in self.store.iter_values():
+            yield Beam.from_dict(beam_info)
+
+    def download_excel_beams_info(self, star_index: int = 6, last_index: int = None, in_memory: bool = True,
+                                  workers: int = 1, incremental: bool = False, deduplicate: bool = False,
+                                  merge: bool = False, prefix: str = None):
+        if merge and (incremental or not in_memory):
+            raise Exception("Merged ingest needs in_memory=True and incremental=False")
+        self.start_profile()
+        catalog = BeamsCatalog()
+        beams_info = {}
+        indices = range(star_index, (len(self.wb.sheetnames) if last_index is None else last_index))
+        if incremental:
+            spans_info, fingerprints = self.download_changed_spans_info(indices, workers)
+        else:
+            spans_info, fingerprints = self.download_excel_spans_info(indices, workers), None
+            self.fingerprints.remove()
+        if not in_memory:
+            with self.measure('reset_values', 'store'):
+                self.reset_values()
+        for span_info in spans_info:
+            beam_name, beam_storey = get_span_beam(span_info['span_name'])
+            if prefix is not None:
+                # Spans are named like their beams, so workbooks sharing sheet names stay apart in the catalog
+                beam_name = prefix + beam_name
+                span_info = dict(span_info, span_name=prefix + span_info['span_name'])
+            catalog.add_span(beam_name, beam_storey, span_info)
+            if in_memory:
+                # Accumulate every beam in memory and write the file once at the end
+                add_beam_span(beams_info.setdefault(beam_name, new_beam_info(beam_name)), span_info)
+                continue
+            with self.measure('update ' + beam_name, 'store'):
+                self.set_default_variable(beam_name, new_beam_info(beam_name))
+                beam_dict = self.get_variable_value(beam_name)
+                add_beam_span(beam_dict, span_info)
+                self.set_variable_value(beam_name, beam_dict)
+        # A merged ingest only replaces its own beams in a store shared with other workbooks. Either way the store
+        # stays locked until its side files are written, so parallel ingests into the same store neither lose each
+        # other's beams nor leave the beams of one workbook with the catalog and sources of another
+        with self.batch():
+            if merge:
+                with self.measure('merge values', 'store'):
+                    sources = self.claim_beams(beams_info, self.load_values())
+                    for beam_name, beam_dict in beams_info.items():
+                        self.set_variable_value(beam_name, beam_dict)
+                    beams_info = self.load_values()
+                catalog = BeamsCatalog.from_beams(beams_info.items())
+            else:
+                sources = dict.fromkeys(catalog.beams, os.path.abspath(self.filePath))
+                if in_memory:
+                    with self.measure('dump_values', 'store'):
+                        self.dump_values(beams_info)
+            with self.measure('dump catalog', 'store'):
+                self.catalog.dump_values(catalog.to_dict())
+                self.sources.dump_values(sources)
+            if deduplicate:
+                with self.measure('dump typical', 'store'):
+                    self.typical.dump_values(deduplicate_beams(beams_info if in_memory else self.load_values()))
+            if fingerprints is not None:
+                with self.measure('dump fingerprints', 'store'):
+                    self.fingerprints.dump_values(fingerprints)
+        self.report_profile()
+
+    def iter_excel_beams_info(self, star_index: int = 6, last_index: int = None, workers: int = 1,
+                              save: bool = True):
+        self.start_profile()
+        indices = range(star_index, (len(self.wb.sheetnames) if last_index is None else last_index))
+        # A beam is complete once its last span sheet has been read
+        last_spans = {}
+        for index in indices:
+            last_spans[get_span_beam(self.wb.sheetnames[index])[0]] = index
+        if save:
+            # The store is rewritten from this workbook, so fingerprints of an earlier ingest no longer describe it
+            self.fingerprints.remove()
+        catalog = BeamsCatalog()
+        beams_info = {}
+        for index, span_info in zip(indices, self.download_excel_spans_info(indices, workers)):
+            beam_name, beam_storey = get_span_beam(span_info['span_name'])
+            catalog.add_span(beam_name, beam_storey, span_info)
+            beam_dict = beams_info.setdefault(beam_name, new_beam_info(beam_name))
+            add_beam_span(beam_dict, span_info)
+            if last_spans[beam_name] == index:
+                yield beam_name, beam_dict
+        if save:
+            with self.batch():
+                with self.measure('dump_values', 'store'):
+                    self.dump_values(beams_info)
+                with self.measure('dump catalog', 'store'):
+                    self.catalog.dump_values(catalog.to_dict())
+                    self.sources.dump_values(dict.fromkeys(catalog.beams, os.path.abspath(self.filePath)))
+        self.report_profile()
+
+    def stream_excel_beams_info(self, star_index: int = 6, last_index: int = None, workers: int = 1,
+                                save: bool = True, queue_depth: int = 4):
+        beams_queue = queue.Queue(maxsize=queue_depth)
+        stop = threading.Event()
+        done = object()
+
+        def produce():
             try:
-                beam_number = re.findall("-(.+?)\(", span_info['span_name'])[0]
-            except BaseException:
-                beam_number = span_info['span_name'].split('-')[1]
-            beam_name = 'V' + beam_storey + '-' + beam_number
-            if beam_storey not in storey_beam_numbers:
-                storey_beam_numbers.setdefault(beam_storey, [])
-            if beam_number not in storey_beam_numbers[beam_storey]:
-                storey_beam_numbers[beam_storey].append(beam_number)
-            self.set_default_variable(beam_name, {
-                "beam_name": beam_name,
-                "spans_num": 0,
-                "spans_info": []
-            })
-            beam_dict = self.get_variable_value(beam_name)
-            spans_num = beam_dict['spans_num']
-            spans_info = beam_dict['spans_info']
-            spans_info.append(span_info)
-            beam_dict.update({
-                "beam_name": beam_name,
-                "spans_num": spans_num + 1,
-                "spans_info": spans_info
-            })
-            self.set_variable_value(beam_name, beam_dict)
+                for beam in self.iter_excel_beams_info(star_index, last_index, workers, save):
+                    if stop.is_set():
+                        return
+                    beams_queue.put(beam)
+                beams_queue.put(done)
+            except BaseException as error:
+                beams_queue.put(error)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = beams_queue.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Unblock the producer if the consumer stopped early
+            stop.set()
+            while producer.is_alive():
+                try:
+                    beams_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def download_changed_spans_info(self, indices, workers: int = 1):
+        sheetnames = [self.wb.sheetnames[index] for index in indices]
+        with self.measure('fingerprint sheets', 'workbook'):
+            fingerprints = get_sheets_fingerprints(self.filePath, sheetnames)
+        try:
+            with self.measure('load previous ingest', 'store'):
+                old_fingerprints = self.fingerprints.load_values()
+                old_spans_info = {span_info['span_name']: span_info for beam_info in self.load_values().values()
+                                  for span_info in beam_info['spans_info']}
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            old_fingerprints, old_spans_info = {}, {}
+        changed_indices = [index for index, sheetname in zip(indices, sheetnames) if sheetname not in old_spans_info
+                           or old_fingerprints.get(sheetname) != fingerprints[sheetname]]
+        new_spans_info = {span_info['span_name']: span_info for span_info in
+                          self.download_excel_spans_info(changed_indices, workers)}
+        # Splice the re-extracted spans back in sheet order
+        spans_info = [new_spans_info.get(sheetname, old_spans_info.get(sheetname)) for sheetname in sheetnames]
+        return spans_info, fingerprints
+
+    def download_excel_spans_info(self, indices, workers: int = 1):
+        indices = list(indices)
+        if workers <= 1:
+            for index in indices:
+                yield self.download_excel_span_info(index)
+            return
+        # One contiguous sheet range per worker, so each process loads the workbook (and its shared strings) once
+        chunk_size = max(1, math.ceil(len(indices) / workers))
+        profile = self.profiler is not None
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download_workbook_spans_info, self.filePath, self.engine,
+                                       indices[first:first + chunk_size], profile)
+                       for first in range(0, len(indices), chunk_size)]
+            for future in futures:
+                if not profile:
+                    yield from future.result()
+                    continue
+                spans_info, load, records = future.result()
+                self.profiler.add_worker_load(load)
+                for record in records:
+                    self.profiler.add_sheet(record)
+                yield from spans_info
 
     def download_excel_span_info(self, index):
+        if self.profiler is not None:
+            span_info, record = read_profiled_span_info(self.wb, index, self.engine)
+            self.profiler.add_sheet(record)
+            return span_info
         ws = self.wb[self.wb.sheetnames[index]]
-        span_keys = ['span_name', 'left_support_info', 'right_support_info', 'free_length', 'width', 'height',
-                     'bars_info', 'stirrups_info']
-        span_name = ws.title
-        ls_info = [ws['L78'].value, ws['N78'].value]
-        rs_info = [ws['L80'].value, ws['N80'].value]
-        free_length = ws['L79'].value
-        width = ws['Q78'].value / 100
-        height = ws['Q79'].value / 100
-
-        bars_info = {'quantity': {
-            'top_left': 0,
-            'top_right': 0,
-            'bottom_left': 0,
-            'bottom_center': 0,
-            'bottom_right': 0},
-            'info': []}
-        bars_keys = ['label', 'case', 'side', 'order', 'left_cut', 'right_cut', 'tie_info']
-        # Top long bar
-        if ws['O90'].value != 0 or ws['O91'].value != 0:
-            label = ""
-            label_1 = str(ws['O90'].value) + '%%C' + ws['Q90'].value
-            label_2 = str(ws['O91'].value) + '%%C' + ws['Q91'].value
-            if ws['O90'].value != 0:
-                label = label + label_1 + (' + ' if ws['O91'].value != 0 else '')
-            if ws['O91'].value != 0:
-                label = label + label_2
-            case = 0
-            side = 1
-            order = 0
-            left_cut = [ws['F189'].value - ws['F219'].value,
-                        ws['F190'].value - ws['F219'].value]
-            right_cut = [ws['F258'].value - ws['F257'].value,
-                         ws['F259'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, [False, False], False, [False, False]]
-            tie_info[1] = True if ws['E97'].value else False
-            tie_info[2][0] = True if ws['N90'].value else False
-            tie_info[2][1] = True if ws['N91'].value else False
-            tie_info[3] = True if ws['AA97'].value else False
-            tie_info[4][0] = True if ws['R90'].value else False
-            tie_info[4][1] = True if ws['R91'].value else False
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Bottom long bar
-        if ws['O135'].value != 0 or ws['O136'].value != 0:
-            label = ""
-            label_1 = str(ws['O135'].value) + '%%C' + ws['Q135'].value
-            label_2 = str(ws['O136'].value) + '%%C' + ws['Q136'].value
-            if ws['O135'].value != 0:
-                label = label + label_1 + (' + ' if ws['O136'].value != 0 else '')
-            if ws['O136'].value != 0:
-                label = label + label_2
-            case = 0
-            side = -1
-            order = 0
-            left_cut = [ws['F204'].value - ws['F219'].value,
-                        ws['F205'].value - ws['F219'].value]
-            right_cut = [ws['F273'].value - ws['F257'].value,
-                         ws['F274'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, [False, False], False, [False, False]]
-            tie_info[1] = True if ws['E125'].value else False
-            tie_info[2][0] = True if ws['N135'].value else False
-            tie_info[2][1] = True if ws['N136'].value else False
-            tie_info[3] = True if ws['AA125'].value else False
-            tie_info[4][0] = True if ws['R135'].value else False
-            tie_info[4][1] = True if ws['R136'].value else False
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Top left first order bar
-        if ws['J101'].value != 0 or ws['J103'].value != 0:
-            label = ""
-            label_1 = str(ws['J101'].value) + '%%C' + ws['L101'].value
-            label_2 = str(ws['J103'].value) + '%%C' + ws['L103'].value
-            if ws['J101'].value != 0:
-                label = label + label_1 + (' + ' if ws['J103'].value != 0 else '')
-            if ws['J103'].value != 0:
-                label = label + label_2
-            case = 1
-            side = 1
-            order = 1
-            left_cut = [ws['F194'].value - ws['F219'].value,
-                        ws['F195'].value - ws['F219'].value]
-            right_cut = [ws['F220'].value - ws['F219'].value,
-                         ws['F220'].value - ws['F219'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['E99'].value else False
-            tie_info[2][0] = True if ws['I101'].value else False
-            tie_info[2][1] = True if ws['I103'].value else False
-            bars_info['quantity']['top_left'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Top left second order bar
-        if ws['F103'].value != 0 or ws['F105'].value != 0:
-            label = ""
-            label_1 = str(ws['F103'].value) + '%%C' + ws['H103'].value
-            label_2 = str(ws['F105'].value) + '%%C' + ws['H105'].value
-            if ws['F103'].value != 0:
-                label = label + label_1 + (' + ' if ws['F105'].value != 0 else '')
-            if ws['F105'].value != 0:
-                label = label + label_2
-            case = 1
-            side = 1
-            order = 2
-            left_cut = [ws['F199'].value - ws['F219'].value,
-                        ws['F200'].value - ws['F219'].value]
-            right_cut = [ws['F223'].value - ws['F219'].value,
-                         ws['F223'].value - ws['F219'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['E101'].value else False
-            tie_info[2][0] = True if ws['E103'].value else False
-            tie_info[2][1] = True if ws['E105'].value else False
-            bars_info['quantity']['top_left'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Bottom left first order bar
-        if ws['J118'].value != 0 or ws['J120'].value != 0:
-            label = ""
-            label_1 = str(ws['J118'].value) + '%%C' + ws['L118'].value
-            label_2 = str(ws['J120'].value) + '%%C' + ws['L120'].value
-            if ws['J118'].value != 0:
-                label = label + label_1 + (' + ' if ws['J120'].value != 0 else '')
-            if ws['J120'].value != 0:
-                label = label + label_2
-            case = 1
-            side = -1
-            order = 1
-            left_cut = [ws['F209'].value - ws['F219'].value,
-                        ws['F210'].value - ws['F219'].value]
-            right_cut = [ws['F226'].value - ws['F219'].value,
-                         ws['F226'].value - ws['F219'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['E123'].value else False
-            tie_info[2][0] = True if ws['I118'].value else False
-            tie_info[2][1] = True if ws['I120'].value else False
-            bars_info['quantity']['bottom_left'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Bottom left second order bar
-        if ws['F116'].value != 0 or ws['F118'].value != 0:
-            label = ""
-            label_1 = str(ws['F116'].value) + '%%C' + ws['H116'].value
-            label_2 = str(ws['F118'].value) + '%%C' + ws['H118'].value
-            if ws['F116'].value != 0:
-                label = label + label_1 + (' + ' if ws['F118'].value != 0 else '')
-            if ws['F118'].value != 0:
-                label = label + label_2
-            case = 1
-            side = -1
-            order = 2
-            left_cut = [ws['F214'].value - ws['F219'].value,
-                        ws['F215'].value - ws['F219'].value]
-            right_cut = [ws['F229'].value - ws['F219'].value,
-                         ws['F229'].value - ws['F219'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['E121'].value else False
-            tie_info[2][0] = True if ws['E116'].value else False
-            tie_info[2][1] = True if ws['E118'].value else False
-            bars_info['quantity']['bottom_left'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Bottom central first order bar
-        if ws['O116'].value != 0 or ws['O118'].value != 0:
-            label = ""
-            label_1 = str(ws['O116'].value) + '%%C' + ws['Q116'].value
-            label_2 = str(ws['O118'].value) + '%%C' + ws['Q118'].value
-            if ws['O116'].value != 0:
-                label = label + label_1 + (' + ' if ws['O118'].value != 0 else '')
-            if ws['O118'].value != 0:
-                label = label + label_2
-            case = 2
-            side = -1
-            order = 1
-            left_cut = [ws['F232'].value - ws['F219'].value,
-                        ws['F232'].value - ws['F219'].value]
-            right_cut = [ws['F251'].value - ws['F257'].value,
-                         ws['F251'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, False]
-            bars_info['quantity']['bottom_center'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Bottom central second order bar
-        if ws['O108'].value != 0 or ws['O110'].value != 0:
-            label = ""
-            label_1 = str(ws['O108'].value) + '%%C' + ws['Q108'].value
-            label_2 = str(ws['O110'].value) + '%%C' + ws['Q110'].value
-            if ws['O108'].value != 0:
-                label = label + label_1 + (' + ' if ws['O110'].value != 0 else '')
-            if ws['O110'].value != 0:
-                label = label + label_2
-            case = 2
-            side = -1
-            order = 2
-            left_cut = [ws['F235'].value - ws['F219'].value,
-                        ws['F235'].value - ws['F219'].value]
-            right_cut = [ws['F254'].value - ws['F257'].value,
-                         ws['F254'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, False]
-            bars_info['quantity']['bottom_center'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Top right first order bar
-        if ws['T101'].value != 0 or ws['T103'].value != 0:
-            label = ""
-            label_1 = str(ws['T101'].value) + '%%C' + ws['V101'].value
-            label_2 = str(ws['T103'].value) + '%%C' + ws['V103'].value
-            if ws['T101'].value != 0:
-                label = label + label_1 + (' + ' if ws['T103'].value != 0 else '')
-            if ws['T103'].value != 0:
-                label = label + label_2
-            case = 3
-            side = 1
-            order = 1
-            left_cut = [ws['F239'].value - ws['F257'].value,
-                        ws['F239'].value - ws['F257'].value]
-            right_cut = [ws['F263'].value - ws['F257'].value,
-                         ws['F264'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['AA99'].value else False
-            tie_info[2][0] = True if ws['W101'].value else False
-            tie_info[2][1] = True if ws['W103'].value else False
-            bars_info['quantity']['top_right'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Top right second order bar
-        if ws['X103'].value != 0 or ws['X105'].value != 0:
-            label = ""
-            label_1 = str(ws['X103'].value) + '%%C' + ws['Z103'].value
-            label_2 = str(ws['X105'].value) + '%%C' + ws['Z105'].value
-            if ws['X103'].value != 0:
-                label = label + label_1 + (' + ' if ws['X105'].value != 0 else '')
-            if ws['X105'].value != 0:
-                label = label + label_2
-            case = 3
-            side = 1
-            order = 2
-            left_cut = [ws['F242'].value - ws['F257'].value,
-                        ws['F242'].value - ws['F257'].value]
-            right_cut = [ws['F268'].value - ws['F257'].value,
-                         ws['F269'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['AA101'].value else False
-            tie_info[2][0] = True if ws['AA103'].value else False
-            tie_info[2][1] = True if ws['AA105'].value else False
-            bars_info['quantity']['top_right'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Bottom right first order bar
-        if ws['T118'].value != 0 or ws['T120'].value != 0:
-            label = ""
-            label_1 = str(ws['T118'].value) + '%%C' + ws['V118'].value
-            label_2 = str(ws['T120'].value) + '%%C' + ws['V120'].value
-            if ws['T118'].value != 0:
-                label = label + label_1 + (' + ' if ws['T120'].value != 0 else '')
-            if ws['T120'].value != 0:
-                label = label + label_2
-            case = 3
-            side = -1
-            order = 1
-            left_cut = [ws['F245'].value - ws['F257'].value,
-                        ws['F245'].value - ws['F257'].value]
-            right_cut = [ws['F278'].value - ws['F257'].value,
-                         ws['F279'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['AA123'].value else False
-            tie_info[2][0] = True if ws['W118'].value else False
-            tie_info[2][1] = True if ws['W120'].value else False
-            bars_info['quantity']['bottom_right'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-        # Bottom right second order bar
-        if ws['X116'].value != 0 or ws['X118'].value != 0:
-            label = ""
-            label_1 = str(ws['X116'].value) + '%%C' + ws['Z116'].value
-            label_2 = str(ws['X118'].value) + '%%C' + ws['Z118'].value
-            if ws['X116'].value != 0:
-                label = label + label_1 + (' + ' if ws['X118'].value != 0 else '')
-            if ws['X118'].value != 0:
-                label = label + label_2
-            case = 3
-            side = -1
-            order = 2
-            left_cut = [ws['F248'].value - ws['F257'].value,
-                        ws['F248'].value - ws['F257'].value]
-            right_cut = [ws['F283'].value - ws['F257'].value,
-                         ws['F284'].value - ws['F257'].value]
-            tie_info = [[label_1, label_2], False, [False, False]]
-            tie_info[1] = True if ws['AA121'].value else False
-            tie_info[2][0] = True if ws['AA116'].value else False
-            tie_info[2][1] = True if ws['AA118'].value else False
-            bars_info['quantity']['bottom_right'] += 1
-            bars_info['info'].append(dict(zip(bars_keys, [label, case, side, order, left_cut, right_cut, tie_info])))
-
-        stirrups_info = {'differentiate': ws['I414'].value, 'diameters': {
-            'l2r_diam': "%%C" + str(ws['L416'].value),
-            'r2l_diam': "%%C" + str(ws['L424'].value)},
-            'quantity': {
-            'l2r_two_legged': ws['I416'].value,
-            'l2r_single_legged': ws['J416'].value,
-            'r2l_two_legged': ws['I424'].value,
-            'r2l_single_legged': ws['J424'].value},
-            'text': "",
-            'info': []}
-
-        stirrups_text = str(ws['I416'].value) + ' (est. rect.) '
-        stirrups_text = stirrups_text + ('+ ' + str(ws['J416'].value) + ' (gancho) ' if ws['J416'].value != 0 else '')
-        stirrups_text = stirrups_text + '%%C' + ws['L416'].value + ': ' + ws['M431'].value
-        if not stirrups_info['differentiate']:
-            stirrups_text = stirrups_text + ' c/ext.'
-        else:
-            stirrups_text = stirrups_text + ' ----->    <----- '
-            stirrups_text = stirrups_text + str(ws['I424'].value) + ' (est. rect.) '
-            stirrups_text = stirrups_text + (
-                '+ ' + str(ws['J424'].value) + ' (gancho) ' if ws['J424'].value != 0 else '')
-            stirrups_text = stirrups_text + '%%C' + ws['L424'].value + ': ' + ws['U431'].value
-        stirrups_info['text'] = stirrups_text
-
-        stirrups_keys = ['side', 'quantity', 'spacing']
-        l2r_row = 417
-        while True:
-            quantity = ws.cell(l2r_row, 14).value
-            spacing = ws.cell(l2r_row, 16).value
-            stirrups_info['info'].append(dict(zip(stirrups_keys, [0, quantity, spacing])))
-            if ws.cell(l2r_row, 13).value == 1:
-                break
-            l2r_row += 1
-        r2l_row = 425
-        while True:
-            quantity = ws.cell(r2l_row, 14).value
-            spacing = ws.cell(r2l_row, 16).value
-            stirrups_info['info'].append(dict(zip(stirrups_keys, [1, quantity, spacing])))
-            if ws.cell(r2l_row, 13).value == 1:
-                break
-            r2l_row += 1
-        return dict(zip(span_keys, [span_name, ls_info, rs_info, free_length, width, height, bars_info, stirrups_info]))
+        return read_span_info(ws.title, SPAN_READERS[self.engine](ws))
+
+
+def compare_span_engines(xlsxFilePath, engines=('cell', 'grid', 'xml'), star_index: int = 6, last_index: int = None):
+    timings = {}
+    outputs = {}
+    for engine in engines:
+        assistant = Assistant(xlsxFilePath=xlsxFilePath, engine=engine)
+        start = time.perf_counter()
+        spans_info = [assistant.download_excel_span_info(index) for index in
+                      range(star_index, (len(assistant.wb.sheetnames) if last_index is None else last_index))]
+        timings[engine] = time.perf_counter() - start
+        outputs[engine] = json.dumps(spans_info)
+    for engine in engines[1:]:
+        if outputs[engine] != outputs[engines[0]]:
+            raise Exception("Engine '{0}' does not match engine '{1}'".format(engine, engines[0]))
+    return timings
 
 
 if __name__ == '__main__':
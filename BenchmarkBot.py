@@ -0,0 +1,286 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import warnings
+from queue import Empty
+import numpy as np
+import openpyxl
+from openpyxl.utils.cell import coordinate_to_tuple
+from AssistantBot import Assistant, BAR_CELLS, SPAN_READERS, STIRRUP_ROWS
+from DrawingBot import (get_coordinates, get_polygon_area, is_point_in_triangle, reduce_vertices,
+                        triangulate_polygon)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DIAMETERS = ['8mm', '3/8"', '1/2"', '5/8"', '3/4"', '1"']
+STOREY_BEAMS = 12
+CELL_ENGINE_LIMIT = 100  # the per-cell engine is only timed up to this many sheets unless asked for explicitly
+LEGACY_TRIANGULATION_LIMIT = 1024  # the vertex cap of the scan-and-restart triangulator
+
+
+def get_flag_addresses(flags):
+    addresses = []
+    for flag in flags:
+        if isinstance(flag, list):
+            addresses.extend(get_flag_addresses(flag))
+        elif flag is not False:
+            addresses.append(flag)
+    return addresses
+
+
+def generate_span_cells(rnd: random.Random):
+    cells = {'L78': rnd.choice([0, 0.25, 0.3, 0.6, 1.2]), 'N78': rnd.random() < 0.2,
+             'L79': round(rnd.uniform(1.5, 8.5), 2),
+             'L80': rnd.choice([0, 0.25, 0.3, 0.6, 1.2]), 'N80': rnd.random() < 0.2,
+             'Q78': rnd.choice([25, 30, 40]), 'Q79': rnd.choice([40, 50, 60, 65, 70, 80])}
+    for bar in BAR_CELLS:
+        placed = bar['quantity'] is None or rnd.random() < 0.5
+        (quantity_1, diameter_1), (quantity_2, diameter_2) = bar['bars']
+        cells[quantity_1] = rnd.randint(2, 4) if placed else 0
+        cells[quantity_2] = rnd.choice([0, 0, 1, 2]) if placed else 0
+        cells[diameter_1] = rnd.choice(DIAMETERS)
+        cells[diameter_2] = rnd.choice(DIAMETERS)
+        for (cut_1, cut_2), reference in [bar['left_cut'], bar['right_cut']]:
+            cells.setdefault(reference, round(rnd.uniform(-0.5, 0.5), 3))
+            cells[cut_1] = round(rnd.uniform(-1.5, 1.5), 3)
+            cells[cut_2] = round(rnd.uniform(-1.5, 1.5), 3)
+        for address in get_flag_addresses(bar['tie']):
+            cells[address] = rnd.random() < 0.3
+    cells.update({'I414': rnd.random() < 0.5, 'L416': rnd.choice(DIAMETERS[1:4]), 'L424': rnd.choice(DIAMETERS[1:4]),
+                  'I416': rnd.randint(1, 2), 'J416': rnd.choice([0, 1]), 'I424': rnd.randint(1, 2),
+                  'J424': rnd.choice([0, 1])})
+    for first_row, last_row in STIRRUP_ROWS.values():
+        zones = rnd.randint(1, last_row - first_row + 1)
+        for zone in range(zones):
+            row = str(first_row + zone)
+            cells['M' + row] = 1 if zone == zones - 1 else 0
+            cells['N' + row] = 1 if zone == 0 else rnd.randint(1, 12)
+            cells['P' + row] = 5 if zone == 0 else rnd.choice([10, 12.5, 15, 20, 25])
+    cells['M431'] = '1@0.05, Rto.@{0}'.format(rnd.choice([0.1, 0.125, 0.15, 0.2]))
+    cells['U431'] = '1@0.05, Rto.@{0}'.format(rnd.choice([0.1, 0.125, 0.15, 0.2]))
+    return cells
+
+
+def generate_workbook(xlsxFilePath, sheets_num: int, seed: int = 0):
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    for index in range(6):
+        wb.create_sheet('Datos {0}'.format(index + 1)).append(['Synthetic design workbook'])
+    span_index = 0
+    beam_index = 0
+    spans_num = 0
+    for _ in range(sheets_num):
+        if span_index == spans_num:
+            beam_index += 1
+            span_index, spans_num = 0, rnd.randint(1, 4)
+        span_index += 1
+        storey = 'T{0}'.format((beam_index - 1) // STOREY_BEAMS + 1)
+        beam_number = '{0:02d}'.format((beam_index - 1) % STOREY_BEAMS + 1)
+        ws = wb.create_sheet('V{0}-{1} ({2})'.format(storey, beam_number, span_index))
+        rows = {}
+        for address, value in generate_span_cells(rnd).items():
+            row, column = coordinate_to_tuple(address)
+            rows.setdefault(row, {})[column] = value
+        for row in range(1, max(rows) + 1):
+            values = rows.get(row, {})
+            ws.append([values.get(column) for column in range(1, max(values, default=0) + 1)])
+    wb.save(xlsxFilePath)
+
+
+def generate_polygon(vertices_num: int, seed: int = 0):
+    # Star shaped outline with a random radius per vertex: simple, but with about half of its vertices reflex
+    rnd = random.Random(seed)
+    coordinates = []
+    for index in range(vertices_num):
+        angle = 2 * math.pi * index / vertices_num
+        radius = rnd.uniform(5, 10)
+        coordinates += [radius * math.cos(angle), radius * math.sin(angle)]
+    return coordinates
+
+
+def legacy_triangulate_polygon(vertices_list, get_index=False):
+    # triangulate_polygon as it was before the linked ring rewrite, kept as the benchmark's baseline
+    vertices_list = get_coordinates(vertices_list)
+    vertices_list = reduce_vertices(vertices_list)
+    n = len(vertices_list)
+    if n < 3 or n > LEGACY_TRIANGULATION_LIMIT:
+        raise Exception("Number of vertices exceed limits!")
+    if get_polygon_area(vertices_list) > 0:
+        counter = 1
+    else:
+        counter = -1
+    index_list = list(range(0, n))
+    triangles = []
+    triangles_index = []
+    while len(index_list) > 3:
+        for i in range(0, n):
+            a = index_list[i]
+            b = index_list[i - 1]
+            c = index_list[(i + 1) % n]
+            va = vertices_list[a]
+            vb = vertices_list[b]
+            vc = vertices_list[c]
+            vab = np.subtract(vb, va)
+            vac = np.subtract(vc, va)
+            if np.cross(vab, vac) * counter < 0:
+                continue
+            is_ear = True
+            for j in range(0, len(vertices_list)):
+                if j == a or j == b or j == c:
+                    continue
+                vp = vertices_list[j]
+                if is_point_in_triangle(vp, vb, va, vc, counter):
+                    is_ear = False
+                    break
+            if is_ear:
+                triangles.append([vertices_list[b], vertices_list[a], vertices_list[c]])
+                triangles_index.append([b, a, c])
+                index_list.pop(i)
+                break
+    if get_index:
+        return triangles_index
+    else:
+        return triangles
+
+
+def time_triangulation(triangulator, coordinates: list):
+    start = time.perf_counter()
+    try:
+        with warnings.catch_warnings():
+            # np.cross on 2D vectors is deprecated in NumPy 2, and the legacy triangulator calls it constantly
+            warnings.simplefilter('ignore', DeprecationWarning)
+            triangles = triangulator(coordinates, get_index=True)
+    except Exception as error:
+        return {'seconds': time.perf_counter() - start, 'triangles': None, 'error': repr(error)}
+    return {'seconds': time.perf_counter() - start, 'triangles': len(triangles), 'error': None}
+
+
+def run_triangulation_benchmark(sizes=(100, 1000, 10000), output: str = None, seed: int = 0):
+    triangulators = {'ring': triangulate_polygon, 'legacy': legacy_triangulate_polygon}
+    results = []
+    for vertices_num in sizes:
+        coordinates = generate_polygon(vertices_num, seed)
+        for name, triangulator in triangulators.items():
+            if name == 'legacy' and vertices_num > LEGACY_TRIANGULATION_LIMIT:
+                continue
+            result = time_triangulation(triangulator, coordinates)
+            result.update({'vertices': vertices_num, 'triangulator': name})
+            results.append(result)
+            print('{0:>7} vertices  {1:<6} {2:9.3f} s  {3}'.format(
+                vertices_num, name, result['seconds'],
+                result['error'] or '{0} triangles'.format(result['triangles'])))
+    if output is not None:
+        append_history(output, {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'benchmark': 'triangulation',
+                                'python': platform.python_version(), 'platform': platform.platform(),
+                                'seed': seed, 'results': results})
+    return results
+
+
+def append_history(output: str, entry: dict):
+    try:
+        with open(output) as jsonFile:
+            history = json.load(jsonFile)
+    except FileNotFoundError:
+        history = []
+    history.append(entry)
+    with open(output, 'w') as jsonFile:
+        json.dump(history, jsonFile, indent=2)
+
+
+def get_peak_rss_kib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def time_ingest(xlsxFilePath, engine: str, results):
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            assistant = Assistant(os.path.join(directory, 'Beams_info'), xlsxFilePath, engine)
+            assistant.download_excel_beams_info()
+            seconds = time.perf_counter() - start
+    except Exception as error:
+        results.put({'error': repr(error)})
+        return
+    results.put({'seconds': seconds, 'peak_rss_kib': get_peak_rss_kib()})
+
+
+def get_result(process: multiprocessing.Process, results):
+    # A run killed before it reports (OOM, a crash in the reader) would otherwise leave us waiting forever
+    while True:
+        try:
+            return results.get(timeout=1)
+        except Empty:
+            if process.is_alive():
+                continue
+        try:
+            # It may have reported just before exiting
+            return results.get(timeout=1)
+        except Empty:
+            return {'error': 'process exited with code {0} without a result'.format(process.exitcode)}
+
+
+def run_benchmark(sizes=(10, 100, 1000), engines=None, workdir: str = 'benchmark', output: str = None,
+                  seed: int = 0):
+    default_engines = engines is None
+    engines = sorted(SPAN_READERS) if default_engines else engines
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    for sheets_num in sizes:
+        xlsxFilePath = os.path.join(workdir, 'synthetic_{0}_{1}.xlsx'.format(sheets_num, seed))
+        if not os.path.exists(xlsxFilePath):
+            generate_workbook(xlsxFilePath, sheets_num, seed)
+        for engine in engines:
+            if default_engines and engine == 'cell' and sheets_num > CELL_ENGINE_LIMIT:
+                continue
+            # Each run gets its own process so the peak RSS belongs to that run alone
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=time_ingest, args=(xlsxFilePath, engine, queue))
+            process.start()
+            result = get_result(process, queue)
+            process.join()
+            if 'error' in result:
+                raise Exception("Ingest of {0} with engine '{1}' failed: {2}".format(
+                    xlsxFilePath, engine, result['error']))
+            result.update({'sheets': sheets_num, 'engine': engine,
+                           'sheets_per_sec': sheets_num / result['seconds']})
+            results.append(result)
+            print('{0:>6} sheets  {1:<5} {2:9.3f} s {3:10.1f} sheets/s  peak RSS {4} KiB'.format(
+                sheets_num, engine, result['seconds'], result['sheets_per_sec'], result['peak_rss_kib']))
+    if output is not None:
+        append_history(output, {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                                'python': platform.python_version(), 'platform': platform.platform(),
+                                'seed': seed, 'results': results})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time Assistant ingest on synthetic design workbooks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--engines', nargs='+', choices=sorted(SPAN_READERS),
+                        help='engines to time (default: all; cell only up to {0} sheets)'.format(CELL_ENGINE_LIMIT))
+    parser.add_argument('--workdir', default='benchmark')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--triangulation', action='store_true',
+                        help='time triangulate_polygon against the legacy triangulator instead of the ingest')
+    parser.add_argument('--vertices', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='polygon sizes for --triangulation (legacy only up to {0} vertices)'.format(
+                            LEGACY_TRIANGULATION_LIMIT))
+    args = parser.parse_args()
+    if args.triangulation:
+        run_triangulation_benchmark(args.vertices, args.output, args.seed)
+    else:
+        run_benchmark(args.sizes, args.engines, args.workdir, args.output, args.seed)
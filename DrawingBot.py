@@ -1,20 +1,32 @@
-import win32com.client
-import pythoncom
+try:
+    import win32com.client
+    import pythoncom
+except ImportError:
+    win32com = None
+    pythoncom = None
 # import comtypes.client
+import argparse
+import bisect
 import math
+import os
 from fractions import Fraction
 import numpy as np
 import time
-from AssistantBot import Assistant
+from collections import deque
+from contextlib import contextmanager
+from AssistantBot import Assistant, Beam, LongitudinalBar
+from DxfBot import DxfDocument, TEXT_ALIGNMENTS
 from operator import itemgetter
 from typing import Union, Tuple
 from typing import Annotated
 from typing import Self
 from typing import Any
-import json
 
 
 def aDouble(xyz):
+    if win32com is None:
+        # Only a stand-in COM object (see RecorderBot) can be driven without pywin32
+        return tuple(xyz)
     return win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, xyz)
 
 
@@ -23,6 +35,8 @@ def aDispatch(vObject):
 
 
 class Point:
+    __slots__ = ('x', 'y', 'z', '_APoint')
+
     def __init__(self, x: Union[int, float, np.ndarray, list, tuple], y: Union[int, float] = 0.0,
                  z: Union[int, float] = 0.0):
         if isinstance(x, (np.ndarray, list, tuple)):
@@ -38,7 +52,14 @@ class Point:
             self.x, self.y, self.z = x, y, z
         else:
             raise Exception("Integer or float expected")
-        self.APoint = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, (self.x, self.y, self.z))
+        self._APoint = None
+
+    @property
+    def APoint(self):
+        # The COM VARIANT is only built once a COM backend asks for it; most points never reach AutoCAD
+        if self._APoint is None:
+            self._APoint = aDouble((self.x, self.y, self.z))
+        return self._APoint
 
     def distance2point(self, P0: Self) -> float:
         return math.sqrt((self.x - P0.x) ** 2 +
@@ -47,7 +68,7 @@ class Point:
 
     def distance2line(self, L0: 'Line') -> float:
         x, y, z = self.x, self.y, self.z
-        A, B, C = L0.A, L0.B, L0.C
+        A, B, C = L0.general
         return math.fabs(A * x + B * y + C) / math.sqrt(A ** 2 + B ** 2)
 
     def projection2line(self, L0: 'Line') -> Self:
@@ -86,6 +107,8 @@ class Point:
 
 
 class Line:
+    __slots__ = ('P0', 'P1', 'm', 'b', '_general')
+
     def __init__(self, P0: Point, P1: Point):
         self.P0 = P0
         self.P1 = P1
@@ -95,7 +118,26 @@ class Line:
         else:
             self.m = (self.P1.y - self.P0.y) / (self.P1.x - self.P0.x)
             self.b = self.P0.y - self.m * self.P0.x
-        self.A, self.B, self.C = self.line2general()
+        self._general = None
+
+    @property
+    def general(self) -> tuple[int | float, int | float, int | float]:
+        # A, B and C are worked out on first use and kept
+        if self._general is None:
+            self._general = self.line2general()
+        return self._general
+
+    @property
+    def A(self) -> int | float:
+        return self.general[0]
+
+    @property
+    def B(self) -> int | float:
+        return self.general[1]
+
+    @property
+    def C(self) -> int | float:
+        return self.general[2]
 
     def line2general(self) -> tuple[int | float, int | float, int | float]:
         if self.m is None:
@@ -114,8 +156,9 @@ class Line:
         return A, B, C
 
     def intersect2line(self, L0: Self) -> Point:
-        A, B, C = self.A, self.B, -self.C
-        A0, B0, C0 = L0.A, L0.B, -L0.C
+        A, B, C = self.general
+        A0, B0, C0 = L0.general
+        C, C0 = -C, -C0
         if A * B0 - A0 * B == 0:
             raise Exception("Lines are parallel. There no intersection")
         else:
@@ -125,8 +168,8 @@ class Line:
         return self.P0.interpolate2point(self.P1, 0.5)
 
     def is_parallel(self, L0: Self) -> bool:
-        A, B, C = self.A, self.B, self.C
-        A0, B0, C0 = L0.A, L0.B, L0.C
+        A, B, C = self.general
+        A0, B0, C0 = L0.general
         if A0 != 0 and B0 != 0:
             if A / A0 == B / B0:
                 return True
@@ -139,8 +182,8 @@ class Line:
                 return False
 
     def is_same(self, L0: Self) -> bool:
-        A, B, C = self.A, self.B, self.C
-        A0, B0, C0 = L0.A, L0.B, L0.C
+        A, B, C = self.general
+        A0, B0, C0 = L0.general
         if A0 != 0 and B0 != 0 and C0 != 0:
             if A / A0 == B / B0 and B / B0 == C / C0:
                 return True
@@ -153,6 +196,82 @@ class Line:
                 return False
 
 
+def as_coordinates(points) -> np.ndarray:
+    # (N, 3) float array from Points, (x, y[, z]) rows or a flat x, y, z, x, y, z, ... sequence
+    if isinstance(points, PointArray):
+        return points.coordinates
+    if isinstance(points, Point):
+        return np.array([[points.x, points.y, points.z]], dtype=float)
+    points = list(points)
+    if points and isinstance(points[0], Point):
+        return np.array([[point.x, point.y, point.z] for point in points], dtype=float)
+    coordinates = np.asarray(points, dtype=float)
+    if coordinates.ndim == 1:
+        coordinates = coordinates.reshape(-1, 3)
+    if coordinates.shape[1] == 2:
+        coordinates = np.column_stack([coordinates, np.zeros(len(coordinates))])
+    return coordinates
+
+
+class PointArray:
+    # Many points at once as an (N, 3) array; the operations mirror Point's, one row per point. Other points
+    # broadcast: a single Point applies to every row, an array of the same length pairs row by row
+    __slots__ = ('coordinates',)
+
+    def __init__(self, points):
+        self.coordinates = as_coordinates(points)
+
+    @classmethod
+    def from_xy(cls, x: np.ndarray, y: np.ndarray, z: Union[np.ndarray, float] = 0.0) -> Self:
+        x = np.asarray(x, dtype=float)
+        return cls(np.column_stack([x, np.asarray(y, dtype=float), np.broadcast_to(z, x.shape)]))
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def __getitem__(self, index) -> Union[Point, Self]:
+        if isinstance(index, (int, np.integer)):
+            return Point(*self.coordinates[index].tolist())
+        return PointArray(self.coordinates[index])
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.coordinates[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.coordinates[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.coordinates[:, 2]
+
+    def to_points(self) -> list:
+        return [Point(*row) for row in self.coordinates.tolist()]
+
+    def to_list(self) -> list:
+        # Flat x, y, z, ... list of Python floats, as draw_polyline and AddPolyline take it
+        return self.coordinates.ravel().tolist()
+
+    def distance2point(self, P0: Union[Point, Self]) -> np.ndarray:
+        return np.linalg.norm(self.coordinates - as_coordinates(P0), axis=1)
+
+    def rotation(self, c: Union[Point, Self], angle: Union[float, np.ndarray]) -> Self:
+        center = as_coordinates(c)
+        s = np.sin(angle)
+        c = np.cos(angle)
+        x = self.x - center[:, 0]
+        y = self.y - center[:, 1]
+        return PointArray.from_xy(x * c - y * s + center[:, 0], x * s + y * c + center[:, 1], self.z)
+
+    def interpolate2point(self, P0: Union[Point, Self], alpha: Union[float, np.ndarray]) -> Self:
+        alpha = np.reshape(alpha, (-1, 1))
+        return PointArray(as_coordinates(P0) * alpha + self.coordinates * (1 - alpha))
+
+    def moved(self, P0: Point, P1: Point) -> Self:
+        return PointArray(self.coordinates + (as_coordinates(P1) - as_coordinates(P0)))
+
+
 # def get_dev_length(D, tie_case):
 #     lengths = AssistantBot.get_variable_value("DEV_LENGTHS")
 #     if tie_case != 2:
@@ -182,85 +301,792 @@ class Line:
 #     return sign
 
 
-class CAD:
-    def __init__(self, file_name='NewDrawing.dwg'):
-        self.acad = win32com.client.Dispatch("AutoCAD.Application")
+# Average glyph advance of the txt font as a fraction of the text height, for estimating text extents
+TEXT_WIDTH_FACTOR = 0.9
+# Room taken by a dimension's text beyond its dimension line (DIMTXT * DIMSCALE plus the gap, rounded up)
+DIMENSION_TEXT_MARGIN = 0.1
+
+
+class Entity:
+    # A drawn object as CAD keeps it: its model space geometry plus the backend's own handle for it
+    __slots__ = ('kind', 'layer', 'points', 'data', 'handle')
+
+    def __init__(self, kind: str, layer: str, points: list, data: dict = None, handle: Any = None):
+        self.kind = kind
+        self.layer = layer
+        self.points = [tuple(point) for point in points]
+        self.data = {} if data is None else data
+        self.handle = handle
+
+    def moved(self, P0: Point, P1: Point) -> Self:
+        dx, dy, dz = P1.x - P0.x, P1.y - P0.y, P1.z - P0.z
+        return Entity(self.kind, self.layer, [(x + dx, y + dy, z + dz) for x, y, z in self.points], dict(self.data))
+
+    def mirrored(self, P0: Point, P1: Point) -> Self:
+        angle = math.atan2(P1.y - P0.y, P1.x - P0.x)
+        ux, uy = math.cos(angle), math.sin(angle)
+        points = []
+        for x, y, z in self.points:
+            t = (x - P0.x) * ux + (y - P0.y) * uy
+            points.append((2 * (P0.x + t * ux) - x, 2 * (P0.y + t * uy) - y, z))
+        data = dict(self.data)
+        # Text keeps reading left to right (MIRRTEXT off); a dimension's rotation is reflected
+        if self.kind == 'dimension':
+            data['angle'] = (2 * angle - data['angle']) % math.pi
+        return Entity(self.kind, self.layer, points, data)
+
+    def move(self, P0: Point, P1: Point):
+        self.points = self.moved(P0, P1).points
+
+    def get_extents(self) -> tuple:
+        # (xmin, ymin, xmax, ymax) of the entity as drawn; text size is estimated from its height
+        xs = [point[0] for point in self.points]
+        ys = [point[1] for point in self.points]
+        if self.kind == 'text':
+            x, y = xs[0], ys[0]
+            height = self.data['height']
+            if self.data['mtext']:
+                width = self.data['box_width']
+            else:
+                width = len(self.data['text'].replace('%%C', 'C').replace('%%c', 'c')) * height * TEXT_WIDTH_FACTOR
+            horizontal, vertical = TEXT_ALIGNMENTS.get(self.data['alignment'], (0, 0))
+            left = x - width / 2 if horizontal in (1, 4) else x - width if horizontal == 2 else x
+            bottom = y - height / 2 if vertical == 2 or horizontal == 4 else y - height if vertical == 3 else y
+            return left, bottom, left + width, bottom + height
+        if self.kind == 'dimension':
+            margin = DIMENSION_TEXT_MARGIN
+            return min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+def get_entities_extents(entities: list) -> tuple:
+    extents = [entity.get_extents() for entity in entities if entity.points]
+    if not extents:
+        return 0.0, 0.0, 0.0, 0.0
+    return (min(extent[0] for extent in extents), min(extent[1] for extent in extents),
+            max(extent[2] for extent in extents), max(extent[3] for extent in extents))
+
+
+def get_box_distance(extents: tuple, P0: Point) -> float:
+    # Distance from P0 to the box, 0 inside it
+    xmin, ymin, xmax, ymax = extents
+    return math.hypot(max(xmin - P0.x, 0, P0.x - xmax), max(ymin - P0.y, 0, P0.y - ymax))
+
+
+# Side of the EntityIndex grid cells in drawing units; beams are drawn in metres
+INDEX_CELL_SIZE = 1.0
+
+
+class EntityIndex:
+    # Uniform grid of the entities' bounding boxes, kept as they are drawn so regions can be queried without
+    # asking AutoCAD. Queries return entities in the order they were drawn. Entities are only measured and filed
+    # once a query needs them, so drawings that are never queried pay nothing
+    def __init__(self, cell_size: float = INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        # id(entity) -> [entity, extents, cells, order]
+        self.entries = {}
+        self.pending = []
+        self.count = 0
+        # [imin, jmin, imax, jmax] of the cells ever filed; removals leave it loose, which queries tolerate
+        self.bounds = None
+
+    def get_cells(self, extents: tuple) -> list:
+        xmin, ymin, xmax, ymax = extents
+        i0, j0 = math.floor(xmin / self.cell_size), math.floor(ymin / self.cell_size)
+        i1, j1 = math.floor(xmax / self.cell_size), math.floor(ymax / self.cell_size)
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+    def insert(self, entity: Entity):
+        self.pending.append((entity, self.count))
+        self.count += 1
+
+    def flush(self):
+        for entity, order in self.pending:
+            self.file(entity, order)
+        self.pending = []
+
+    def file(self, entity: Entity, order: int):
+        if not entity.points or id(entity) in self.entries:
+            return
+        extents = entity.get_extents()
+        cells = self.get_cells(extents)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(id(entity))
+        self.entries[id(entity)] = [entity, extents, cells, order]
+        (i0, j0), (i1, j1) = cells[0], cells[-1]
+        if self.bounds is None:
+            self.bounds = [i0, j0, i1, j1]
+        else:
+            self.bounds = [min(self.bounds[0], i0), min(self.bounds[1], j0),
+                           max(self.bounds[2], i1), max(self.bounds[3], j1)]
+
+    def remove(self, entity: Entity):
+        self.flush()
+        entry = self.entries.pop(id(entity), None)
+        if entry is None:
+            return
+        for cell in entry[2]:
+            self.cells[cell].discard(id(entity))
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def update(self, entity: Entity):
+        # After the entity's geometry changed in place, e.g. by a move; it keeps its place in the drawing order
+        if not self.entries:
+            # Nothing filed yet, the pending entities are measured as they are by then
+            return
+        self.flush()
+        entry = self.entries.get(id(entity))
+        if entry is None:
+            return
+        self.remove(entity)
+        self.file(entity, entry[3])
+
+    def clear(self):
+        self.cells = {}
+        self.entries = {}
+        self.pending = []
+        self.bounds = None
+
+    def get_entries(self, extents: tuple, layer: str = None) -> list:
+        self.flush()
+        if self.bounds is None:
+            return []
+        # Only the part of the window over filed cells is walked, however far the window reaches
+        imin, jmin, imax, jmax = self.bounds
+        i0, j0 = math.floor(max(extents[0] / self.cell_size, imin)), math.floor(max(extents[1] / self.cell_size, jmin))
+        i1, j1 = math.floor(min(extents[2] / self.cell_size, imax)), math.floor(min(extents[3] / self.cell_size, jmax))
+        if i0 > i1 or j0 > j1:
+            return []
+        keys = set()
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # Fewer occupied cells than cells under the window
+            for (i, j), cell_keys in self.cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    keys.update(cell_keys)
+        else:
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    keys.update(self.cells.get((i, j), ()))
+        entries = [self.entries[key] for key in keys]
+        if layer is not None:
+            entries = [entry for entry in entries if entry[0].layer == layer]
+        return sorted(entries, key=lambda entry: entry[3])
+
+    def query_window(self, P0: Point, P1: Point, layer: str = None, crossing: bool = True) -> list:
+        # Entities whose box meets the window (crossing) or lies wholly inside it
+        window = min(P0.x, P1.x), min(P0.y, P1.y), max(P0.x, P1.x), max(P0.y, P1.y)
+        entities = []
+        for entity, extents, cells, order in self.get_entries(window, layer):
+            if crossing:
+                inside = (extents[0] <= window[2] and window[0] <= extents[2] and
+                          extents[1] <= window[3] and window[1] <= extents[3])
+            else:
+                inside = (window[0] <= extents[0] and extents[2] <= window[2] and
+                          window[1] <= extents[1] and extents[3] <= window[3])
+            if inside:
+                entities.append(entity)
+        return entities
+
+    def query_near(self, P0: Point, radius: float, layer: str = None) -> list:
+        # Entities whose box comes within radius of P0, nearest first
+        entries = self.get_entries((P0.x - radius, P0.y - radius, P0.x + radius, P0.y + radius), layer)
+        distances = [(get_box_distance(entry[1], P0), entry[3], entry[0]) for entry in entries]
+        return [entity for distance, order, entity in sorted(distances, key=itemgetter(0, 1)) if distance <= radius]
+
+    def query_nearest(self, P0: Point, layer: str = None, count: int = 1) -> list:
+        # The count entities whose boxes are nearest to P0, searched ring by ring of cells around P0's cell
+        self.flush()
+        if not self.entries:
+            return []
+        i0, j0 = math.floor(P0.x / self.cell_size), math.floor(P0.y / self.cell_size)
+        imin, jmin, imax, jmax = self.bounds
+        # Rings that miss the occupied cells altogether are skipped, the others only walk their part within them
+        first_ring = max(imin - i0, i0 - imax, jmin - j0, j0 - jmax, 0)
+        last_ring = max(abs(i0 - imin), abs(i0 - imax), abs(j0 - jmin), abs(j0 - jmax))
+        found = set()
+        # The count nearest so far as (distance, order, entity), nearest first
+        nearest = []
+        for ring in range(first_ring, last_ring + 1):
+            ring_cells = []
+            columns = range(max(i0 - ring, imin), min(i0 + ring, imax) + 1)
+            for j in {j0 - ring, j0 + ring}:
+                if jmin <= j <= jmax:
+                    ring_cells.extend((i, j) for i in columns)
+            rows = range(max(j0 - ring + 1, jmin), min(j0 + ring - 1, jmax) + 1)
+            for i in {i0 - ring, i0 + ring}:
+                if imin <= i <= imax:
+                    ring_cells.extend((i, j) for j in rows)
+            for cell in ring_cells:
+                for key in self.cells.get(cell, ()):
+                    if key in found:
+                        continue
+                    found.add(key)
+                    entity, extents, cells, order = self.entries[key]
+                    if layer is not None and entity.layer != layer:
+                        continue
+                    distance = get_box_distance(extents, P0)
+                    if len(nearest) < count or (distance, order) < nearest[-1][:2]:
+                        bisect.insort(nearest, (distance, order, entity), key=itemgetter(0, 1))
+                        del nearest[count:]
+            # Cells beyond this ring are at least ring cell sizes away from P0
+            if len(nearest) == count and nearest[-1][0] <= ring * self.cell_size:
+                break
+        return [entity for distance, order, entity in nearest]
+
+
+class BeamLayout:
+    # Decides where each beam goes before it is drawn, so nothing already drawn has to move. Beams are laid out
+    # row by row, left to right and top to bottom, with columns beams per row (1 stacks them). Beams are fed in
+    # drawing order, which lets the layout follow a streamed ingest
+    def __init__(self, columns: int = 1, spacing: float = 1.0, height_factor: float = 0.5,
+                 origin: Union[Point, list] = (0, 0)):
+        self.columns = columns
+        self.spacing = spacing
+        self.height_factor = height_factor
+        self.origin = origin if isinstance(origin, Point) else Point(origin)
+        self.placed = 0
+        self.row_top = self.origin.y
+        self.row_bottom = self.origin.y
+        self.cursor = self.origin.x
+
+    def place(self, extents: tuple, beam_height: float = 0.0) -> Point:
+        # extents are the beam's (xmin, ymin, xmax, ymax) when drawn at (0, 0); returns its insertion point
+        xmin, ymin, xmax, ymax = extents
+        gap = self.spacing + self.height_factor * beam_height
+        if self.columns == 1:
+            x = self.origin.x
+        else:
+            x = self.cursor - xmin
+        y = self.row_top - ymax
+        self.cursor = x + xmax + gap
+        self.row_bottom = min(self.row_bottom, y + ymin - gap)
+        self.placed += 1
+        if self.placed % self.columns == 0:
+            self.row_top = self.row_bottom
+            self.cursor = self.origin.x
+        return Point(x, y)
+
+
+class ComBackend:
+    # Draws into a running AutoCAD through COM. Every call is a round trip to AutoCAD
+    def __init__(self, file_name: str = None, application: Any = None):
+        self.file_name = file_name
+        if application is None:
+            if win32com is None:
+                raise Exception("The COM backend needs pywin32 and a running AutoCAD")
+            self.acad = win32com.client.Dispatch("AutoCAD.Application")
+        else:
+            self.acad = application
         self.acad.Visible = True
         self.acad.Documents.Add()
-        time.sleep(3)
+        if application is None:
+            time.sleep(3)
         self.acadDoc = self.acad.ActiveDocument
         self.acadModel = self.acadDoc.ModelSpace
-        self.objects_list = []
         self.selection_set = self.acadDoc.ActiveSelectionSet
+        self.layers = {}
+        self.active_layer = None
+
+    def add_layer(self, name: str, color_num: int, line_type: str, line_weight: str):
+        new_layer = self.acadDoc.Layers.Add(name)
+        new_layer.color = color_num
+        try:
+            self.acadDoc.Linetypes.Load(line_type, 'acadiso.lin')
+        except Exception:
+            pass
+        finally:
+            new_layer.LineType = line_type
+        if line_weight != 'Default':
+            new_layer.LineWeight = line_weight
+        self.layers[name] = new_layer
+        return new_layer
+
+    def set_active_layer(self, name: str):
+        self.acadDoc.ActiveLayer = self.layers[name]
+        self.active_layer = name
+
+    def add_dim_style(self, name: str, variables: dict):
+        new_style = self.acad.ActiveDocument.DimStyles.Add(name)
+        for variable, value in variables.items():
+            self.acadDoc.SetVariable(variable, value)
+        new_style.CopyFrom(self.acadDoc)
+        self.acadDoc.ActiveDimStyle = new_style
+
+    def add(self, entity: Entity, set_layer: bool = True):
+        points = [aDouble(point) for point in entity.points]
+        if entity.kind == 'point':
+            handle = self.acadModel.AddPoint(points[0])
+            if set_layer:
+                handle.layer = entity.layer
+        elif entity.kind == 'line':
+            handle = self.acadModel.AddLine(points[0], points[1])
+            if set_layer:
+                handle.layer = entity.layer
+        elif entity.kind == 'polyline':
+            handle = self.acadModel.AddPolyline(aDouble([c for point in entity.points for c in point]))
+            if set_layer:
+                handle.layer = entity.layer
+        elif entity.kind == 'text':
+            if entity.data['mtext']:
+                handle = self.acadModel.AddMText(points[0], entity.data['box_width'], entity.data['text'])
+            else:
+                handle = self.acadModel.AddText(entity.data['text'], points[0], entity.data['height'])
+            if set_layer:
+                handle.Layer = entity.layer
+            handle.HorizontalAlignment = 1
+            handle.TextAlignmentPoint = points[0]
+            handle.Alignment = entity.data['alignment']
+        elif entity.kind == 'dimension':
+            handle = self.acadModel.AddDimRotated(points[0], points[1], points[2], entity.data['angle'])
+            if set_layer:
+                handle.Layer = entity.layer
+        else:
+            raise Exception("Invalid entity kind ({0})".format(entity.kind))
+        entity.handle = handle
+
+    def copy(self, entities: list, P0: Point, P1: Point) -> list:
+        copies = []
+        for entity in entities:
+            copy = entity.moved(P0, P1)
+            copy.handle = entity.handle.Copy()
+            copy.handle.Move(P0.APoint, P1.APoint)
+            copies.append(copy)
+        return copies
+
+    def mirror(self, entities: list, P0: Point, P1: Point) -> list:
+        mirrors = []
+        for entity in entities:
+            mirror = entity.mirrored(P0, P1)
+            mirror.handle = entity.handle.Mirror(P0.APoint, P1.APoint)
+            mirrors.append(mirror)
+        return mirrors
+
+    def move(self, entities: list, P0: Point, P1: Point):
+        for entity in entities:
+            entity.handle.Move(P0.APoint, P1.APoint)
+            entity.move(P0, P1)
+
+    def array(self, entity: Entity, rows_number, columns_number, rows_spacing, columns_spacing, levels_num,
+              levels_sp):
+        entity.handle.ArrayRectangular(rows_number, columns_number, levels_num, rows_spacing, columns_spacing,
+                                       levels_sp)
+
+    def erase_all(self):
+        self.selection_set.Clear()
+        self.selection_set.Select(5)
+        self.selection_set.Erase()
+
+    def iter_model(self):
+        for obj in self.acadModel:
+            yield Entity(None, None, [], handle=obj)
+
+    def zoom_all(self):
+        self.acad.ZoomExtents()
+
+    def save(self, file_name: str = None):
+        self.acadDoc.SaveAs(os.path.abspath(self.file_name if file_name is None else file_name))
+
+
+def merge_line_chains(segments: list, tolerance: float = 1e-9):
+    # segments: [(P0, P1, owner)]. Collinear segments that touch or overlap are joined first, then segments sharing
+    # end points are walked into chains. Returns [(points, owners)], a chain of n points standing for n - 1 segments
+    lines = {}
+    chains = []
+    for P0, P1, owner in segments:
+        angle = math.atan2(P1[1] - P0[1], P1[0] - P0[0]) % math.pi
+        ux, uy = math.cos(angle), math.sin(angle)
+        if P0 == P1 or P0[2] != P1[2]:
+            chains.append(([P0, P1], [owner]))
+            continue
+        key = (round(angle, 9), round(P0[1] * ux - P0[0] * uy, 9), P0[2])
+        t0, t1 = P0[0] * ux + P0[1] * uy, P1[0] * ux + P1[1] * uy
+        lines.setdefault(key, []).append((t0, P0, t1, P1, owner) if t0 <= t1 else (t1, P1, t0, P0, owner))
+    merged = []
+    for intervals in lines.values():
+        intervals.sort(key=lambda interval: interval[0])
+        _, P0, end, P1, owner = intervals[0]
+        owners = [owner]
+        for t0, Q0, t1, Q1, owner in intervals[1:]:
+            if t0 <= end + tolerance:
+                owners.append(owner)
+                if t1 > end:
+                    end, P1 = t1, Q1
+            else:
+                merged.append((P0, P1, owners))
+                P0, end, P1, owners = Q0, t1, Q1, [owner]
+        merged.append((P0, P1, owners))
+    nodes = {}
+    for index, (P0, P1, _) in enumerate(merged):
+        nodes.setdefault(P0, []).append(index)
+        nodes.setdefault(P1, []).append(index)
+    used = [False] * len(merged)
+    # Open chains start at dead ends or junctions; whatever is left after that are closed loops
+    starts = [node for node, indices in nodes.items() if len(indices) != 2] + list(nodes)
+    for node in starts:
+        while any(not used[index] for index in nodes[node]):
+            points, owners = [node], []
+            current = node
+            while True:
+                index = next((index for index in nodes[current] if not used[index]), None)
+                if index is None:
+                    break
+                used[index] = True
+                P0, P1, segment_owners = merged[index]
+                current = P1 if P0 == current else P0
+                points.append(current)
+                owners.extend(segment_owners)
+                if len(nodes[current]) != 2:
+                    break
+            chains.append((points, owners))
+    return chains
+
+
+class BufferedComBackend(ComBackend):
+    # Records drawing calls as entities and sends them to AutoCAD in bulk on flush (zoom_all/save call it):
+    # one ActiveLayer switch per layer instead of a layer write per entity, connected lines of a layer as a single
+    # lightweight polyline, and text alignment set only where it is not the default.
+    # After a flush, merged lines share their polyline, so transforming one of them transforms the whole chain
+    def __init__(self, file_name: str = None, application: Any = None):
+        super().__init__(file_name, application)
+        self.pending = []
+
+    def add(self, entity: Entity):
+        self.pending.append(entity)
+
+    def copy(self, entities: list, P0: Point, P1: Point) -> list:
+        # Like move, each shared handle is copied once and the copies of its entities share the new one
+        handles = {}
+        copies = []
+        for entity in entities:
+            copy = entity.moved(P0, P1)
+            if entity.handle is None:
+                self.pending.append(copy)
+            else:
+                if id(entity.handle) not in handles:
+                    handles[id(entity.handle)] = entity.handle.Copy()
+                    handles[id(entity.handle)].Move(P0.APoint, P1.APoint)
+                copy.handle = handles[id(entity.handle)]
+            copies.append(copy)
+        return copies
+
+    def mirror(self, entities: list, P0: Point, P1: Point) -> list:
+        handles = {}
+        mirrors = []
+        for entity in entities:
+            mirror = entity.mirrored(P0, P1)
+            if entity.handle is None:
+                self.pending.append(mirror)
+            else:
+                if id(entity.handle) not in handles:
+                    handles[id(entity.handle)] = entity.handle.Mirror(P0.APoint, P1.APoint)
+                mirror.handle = handles[id(entity.handle)]
+            mirrors.append(mirror)
+        return mirrors
+
+    def move(self, entities: list, P0: Point, P1: Point):
+        handles = {}
+        for entity in entities:
+            if entity.handle is not None:
+                handles[id(entity.handle)] = entity.handle
+            entity.move(P0, P1)
+        for handle in handles.values():
+            handle.Move(P0.APoint, P1.APoint)
+
+    def array(self, entity: Entity, rows_number, columns_number, rows_spacing, columns_spacing, levels_num,
+              levels_sp):
+        if entity.handle is not None:
+            super().array(entity, rows_number, columns_number, rows_spacing, columns_spacing, levels_num, levels_sp)
+            return
+        origin = Point(0, 0, 0)
+        for level in range(levels_num):
+            for row in range(rows_number):
+                for column in range(columns_number):
+                    if level or row or column:
+                        self.copy([entity], origin, Point(column * columns_spacing, row * rows_spacing,
+                                                          level * levels_sp))
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        layers = {}
+        for entity in pending:
+            layers.setdefault(entity.layer, []).append(entity)
+        active_layer = self.active_layer
+        for layer, entities in layers.items():
+            # Entities take the active layer, so only layers CAD never created need setting one by one
+            known = layer in self.layers
+            if known and layer != self.active_layer:
+                self.set_active_layer(layer)
+            lines = [(entity.points[0], entity.points[1], entity) for entity in entities if entity.kind == 'line']
+            for points, owners in merge_line_chains(lines):
+                if len(points) == 2:
+                    handle = self.acadModel.AddLine(aDouble(points[0]), aDouble(points[1]))
+                elif all(point[2] == 0 for point in points):
+                    handle = self.acadModel.AddLightWeightPolyline(aDouble([c for x, y, _ in points for c in (x, y)]))
+                else:
+                    handle = self.acadModel.AddPolyline(aDouble([c for point in points for c in point]))
+                if not known:
+                    handle.layer = layer
+                for owner in owners:
+                    owner.handle = handle
+            for entity in entities:
+                if entity.kind == 'line':
+                    continue
+                if entity.kind != 'text' or entity.data['mtext']:
+                    super().add(entity, not known)
+                    continue
+                P0 = aDouble(entity.points[0])
+                entity.handle = self.acadModel.AddText(entity.data['text'], P0, entity.data['height'])
+                if not known:
+                    entity.handle.Layer = layer
+                if entity.data['alignment'] != 0:
+                    entity.handle.Alignment = entity.data['alignment']
+                    entity.handle.TextAlignmentPoint = P0
+        if self.active_layer != active_layer:
+            self.set_active_layer(active_layer)
+
+    def erase_all(self):
+        self.pending = []
+        super().erase_all()
+
+    def iter_model(self):
+        self.flush()
+        return super().iter_model()
+
+    def zoom_all(self):
+        self.flush()
+        super().zoom_all()
+
+    def save(self, file_name: str = None):
+        self.flush()
+        super().save(file_name)
+
+
+class DxfBackend:
+    # Keeps the drawing in memory and writes it as an AutoCAD R12 DXF file, so no AutoCAD (or Windows) is needed
+    def __init__(self, file_name: str = 'NewDrawing.dxf'):
+        self.file_name = os.path.splitext(file_name)[0] + '.dxf'
+        self.layers = {}
+        self.active_layer = '0'
+        self.dim_styles = {}
+        self.dim_style = None
+        self.entities = []
+        self.zoom = False
+
+    def add_layer(self, name: str, color_num: int, line_type: str, line_weight: str):
+        # R12 has no lineweights, so line_weight is left to the layer defaults
+        self.layers[name] = (color_num, line_type)
+        return name
+
+    def set_active_layer(self, name: str):
+        self.active_layer = name
+
+    def add_dim_style(self, name: str, variables: dict):
+        variables = dict(variables)
+        # R12 has no ArchTick arrow block; oblique ticks (DIMTSZ) draw the same mark
+        if str(variables.get('DIMBLK', '')).lstrip('_').lower() in ('archtick', 'oblique'):
+            variables['DIMTSZ'] = variables.get('DIMASZ', 0.18)
+            for key in ['DIMBLK', 'DIMBLK1', 'DIMBLK2']:
+                variables.pop(key, None)
+        self.dim_styles[name] = variables
+        self.dim_style = name
+
+    def add(self, entity: Entity):
+        self.entities.append(entity)
+
+    def copy(self, entities: list, P0: Point, P1: Point) -> list:
+        copies = [entity.moved(P0, P1) for entity in entities]
+        self.entities.extend(copies)
+        return copies
+
+    def mirror(self, entities: list, P0: Point, P1: Point) -> list:
+        mirrors = [entity.mirrored(P0, P1) for entity in entities]
+        self.entities.extend(mirrors)
+        return mirrors
+
+    def move(self, entities: list, P0: Point, P1: Point):
+        for entity in entities:
+            entity.move(P0, P1)
+
+    def array(self, entity: Entity, rows_number, columns_number, rows_spacing, columns_spacing, levels_num,
+              levels_sp):
+        origin = Point(0, 0, 0)
+        for level in range(levels_num):
+            for row in range(rows_number):
+                for column in range(columns_number):
+                    if level or row or column:
+                        self.copy([entity], origin, Point(column * columns_spacing, row * rows_spacing,
+                                                          level * levels_sp))
+
+    def erase_all(self):
+        self.entities = []
+
+    def iter_model(self):
+        return iter(self.entities)
+
+    def zoom_all(self):
+        self.zoom = True
+
+    def get_document(self) -> DxfDocument:
+        document = DxfDocument()
+        for name, (color_num, line_type) in self.layers.items():
+            document.add_layer(name, color_num, line_type)
+        for name, variables in self.dim_styles.items():
+            document.add_dim_style(name, variables)
+        document.active_layer = self.active_layer
+        document.dim_style = self.dim_style or document.dim_style
+        for entity in self.entities:
+            if entity.kind == 'point':
+                document.add_point(entity.points[0], entity.layer)
+            elif entity.kind == 'line':
+                document.add_line(entity.points[0], entity.points[1], entity.layer)
+            elif entity.kind == 'polyline':
+                document.add_polyline(entity.points, entity.layer)
+            elif entity.kind == 'text':
+                # R12 has no MTEXT; multiline text is written as plain text
+                document.add_text(entity.data['text'], entity.points[0], entity.data['height'], entity.layer,
+                                  entity.data['alignment'])
+            elif entity.kind == 'dimension':
+                document.add_dim_rotated(entity.points[0], entity.points[1], entity.points[2],
+                                         entity.data['angle'], entity.layer)
+        if self.zoom:
+            document.zoom_extents()
+        return document
+
+    def save(self, file_name: str = None):
+        self.get_document().save(self.file_name if file_name is None else file_name)
+
+
+CAD_BACKENDS = {'com': ComBackend, 'buffered': BufferedComBackend, 'dxf': DxfBackend}
+
+
+class CAD:
+    def __init__(self, file_name='NewDrawing.dwg', backend: Union[str, Any] = 'com'):
+        # backend is a CAD_BACKENDS name or a ready backend object, e.g. ComBackend(application=RecordingApplication())
+        if isinstance(backend, str):
+            if backend not in CAD_BACKENDS:
+                raise Exception("Invalid backend option ({0})".format(backend))
+            backend = CAD_BACKENDS[backend](file_name)
+        self.file_name = file_name
+        self.backend = backend
+        self.objects_list = []
         self.selected_objects = []
+        # Bounding boxes of objects_list, for selecting by region without a round trip to the backend
+        self.index = EntityIndex()
         self.layers = {}
+        # Translation applied to everything drawn, see placed_at
+        self.origin = None
+        self.sketch = None
         self.create_new_layer('LCM-TRAZO', 7)
         self.create_new_layer('LCM-ACERO', 4)
         self.create_new_layer('LCM-ESTRIBOS', 1)
         self.create_new_layer('LCM-TEXTOS', 3)
         self.create_new_layer('LCM-COTAS', 1)
-        self.acadDoc.ActiveLayer = self.layers['LCM-TRAZO']
+        # Points and tie bars are drawn on these by default
+        self.create_new_layer('A-TRAZO', 7)
+        self.create_new_layer('A-ACERO', 4)
+        self.backend.set_active_layer('LCM-TRAZO')
         self.create_new_dim_style('PRISMA 1-25')
 
     def create_new_dim_style(self, name: str = "1-100"):
-        new_style = self.acad.ActiveDocument.DimStyles.Add(name)
-        self.acadDoc.SetVariable("DIMDLE", 0.20)
-        self.acadDoc.SetVariable("DIMDLI", 0.20)
-        self.acadDoc.SetVariable("DIMEXE", 0.20)
-        self.acadDoc.SetVariable("DIMEXO", 0.20)
-        self.acadDoc.SetVariable("DIMBLK", 'ArchTick')
-        self.acadDoc.SetVariable("DIMBLK1", 'ArchTick')
-        self.acadDoc.SetVariable("DIMBLK2", 'ArchTick')
-        self.acadDoc.SetVariable("DIMLDRBLK", 'ArchTick')
-        self.acadDoc.SetVariable("DIMASZ", 0.25)
-        self.acadDoc.SetVariable("DIMCEN", 0.09)
-        self.acadDoc.SetVariable("DIMTXT", 0.25)
-        self.acadDoc.SetVariable("DIMTAD", 2)
-        self.acadDoc.SetVariable("DIMGAP", 0.1)
-        self.acadDoc.SetVariable("DIMTMOVE", 2)
-        self.acadDoc.SetVariable("DIMSCALE", 0.25)
-        self.acadDoc.SetVariable("DIMDSEP", '.')
-        self.acadDoc.SetVariable("DIMRND", 0.00)
-        self.acadDoc.SetVariable("DIMZIN", 5)
-        new_style.CopyFrom(self.acadDoc)
-        self.acadDoc.ActiveDimStyle = new_style
+        self.backend.add_dim_style(name, {
+            "DIMDLE": 0.20,
+            "DIMDLI": 0.20,
+            "DIMEXE": 0.20,
+            "DIMEXO": 0.20,
+            "DIMBLK": 'ArchTick',
+            "DIMBLK1": 'ArchTick',
+            "DIMBLK2": 'ArchTick',
+            "DIMLDRBLK": 'ArchTick',
+            "DIMASZ": 0.25,
+            "DIMCEN": 0.09,
+            "DIMTXT": 0.25,
+            "DIMTAD": 2,
+            "DIMGAP": 0.1,
+            "DIMTMOVE": 2,
+            "DIMSCALE": 0.25,
+            "DIMDSEP": '.',
+            "DIMRND": 0.00,
+            "DIMZIN": 5
+        })
 
     def create_new_layer(self, name: str, color_num: int = 1, line_type: str = 'Continuous',
                          line_weight: str = 'Default'):
-        new_layer = self.acadDoc.Layers.Add(name)
-        new_layer.color = color_num
+        self.layers[name] = self.backend.add_layer(name, color_num, line_type, line_weight)
+
+    def add_entity(self, entity: Entity):
+        if self.origin is not None:
+            entity.move(Point(0, 0), self.origin)
+        self.backend.add(entity)
+        self.objects_list.append(entity)
+        self.index.insert(entity)
+
+    @contextmanager
+    def placed_at(self, insertion_point: Union[Point, list, None]):
+        # Draws made inside are shifted so that (0, 0) lands on insertion_point; None keeps the current placement
+        previous = self.origin
+        if insertion_point is not None:
+            self.origin = insertion_point if isinstance(insertion_point, Point) else Point(insertion_point)
         try:
-            self.acadDoc.Linetypes.Load(line_type, 'acadiso.lin')
-        except Exception:
-            pass
+            yield
         finally:
-            new_layer.LineType = line_type
-        if line_weight != 'Default':
-            new_layer.LineWeight = line_weight
-        self.layers[name] = new_layer
+            self.origin = previous
+
+    def get_beam_extents(self, beam_info: Union[dict, Beam], beam_names: list = None) -> tuple:
+        # Dry run on an in-memory drawing; nothing reaches this drawing's backend
+        if self.sketch is None:
+            self.sketch = CAD(backend=DxfBackend())
+        self.sketch.erase_all()
+        if beam_names is None:
+            self.sketch.draw_beam(beam_info)
+        else:
+            self.sketch.draw_typical_beam(beam_info, beam_names)
+        return get_entities_extents(self.sketch.objects_list)
+
+    def draw_beam_in_layout(self, beam_info: Union[dict, Beam], layout: BeamLayout, beam_names: list = None):
+        beam = beam_info if isinstance(beam_info, Beam) else Beam.from_dict(beam_info)
+        insertion_point = layout.place(self.get_beam_extents(beam, beam_names),
+                                       max(span.height for span in beam.spans))
+        if beam_names is None:
+            self.draw_beam(beam, insertion_point)
+        else:
+            self.draw_typical_beam(beam, beam_names, insertion_point)
+        return insertion_point
 
-    def draw_beam(self, beam_info: dict):
+    def flush(self):
+        if hasattr(self.backend, 'flush'):
+            self.backend.flush()
+
+    def save(self, file_name: str = None):
+        self.backend.save(file_name)
+
+    def draw_beam(self, beam_info: Union[dict, Beam], insertion_point: Union[Point, list] = None):
+        if insertion_point is not None:
+            with self.placed_at(insertion_point):
+                return self.draw_beam(beam_info)
+        beam = beam_info if isinstance(beam_info, Beam) else Beam.from_dict(beam_info)
         base_point = 0
-        left_edge = beam_info['spans_info'][0]['left_support_info'][0]
-        left_height = beam_info['spans_info'][0]['height']
+        left_edge = beam.spans[0].left_support_width
+        left_height = beam.spans[0].height
         if left_edge != 0:
             self.draw_line_by_points([base_point - left_edge / 2, -left_height - 0.5, 0],
                                      [base_point - left_edge / 2, 0.5, 0])
-        for span_info in beam_info['spans_info']:
-            # w = span_info['width']  # width
-            h = span_info['height']  # height
-            fl = span_info['free_length']  # free length
-            left_shw = span_info['left_support_info'][0] * 0.5  # half of left_support_width
-            right_shw = span_info['right_support_info'][0] * 0.5  # half of right_support_width
+        for span in beam.spans:
+            # w = span.width  # width
+            h = span.height  # height
+            fl = span.free_length  # free length
+            left_shw = span.left_support_width * 0.5  # half of left_support_width
+            right_shw = span.right_support_width * 0.5  # half of right_support_width
             left_face = base_point + left_shw
             right_face = base_point + left_shw + fl
             self.draw_line_by_points([left_face, 0, 0], [right_face, 0, 0])
-            if not span_info['left_support_info'][1]:
+            if not span.left_support_flag:
                 self.draw_line_by_points([left_face, 0, 0], [left_face, 0.5, 0]) if left_shw != 0 \
                     else self.draw_line_by_points([left_face, 0, 0], [left_face, -0.5 * h, 0])
             else:
                 self.draw_line_by_points([left_face, 0, 0], [left_face, -0.5 * h, 0])
-            if not span_info['right_support_info'][1]:
+            if not span.right_support_flag:
                 self.draw_line_by_points([right_face, 0, 0], [right_face, 0.5, 0]) \
                     if right_shw != 0 else self.draw_line_by_points([right_face, 0, 0], [right_face, -0.5 * h, 0])
             else:
@@ -269,7 +1095,7 @@ class CAD:
             self.mirror([left_face, -0.5 * h, 0], [right_face, -0.5 * h, 0])
             self.draw_linear_dimension(Point(left_face, -h - 0.5), Point(right_face, -h - 0.5), -0.25)
             if left_shw != 0:
-                if not span_info['left_support_info'][1]:
+                if not span.left_support_flag:
                     self.draw_concrete_extension([base_point - left_shw, 0.5, 0], [base_point + left_shw, 0.5, 0])
                     self.select_last(5)
                 else:
@@ -278,13 +1104,13 @@ class CAD:
                 self.copy([0, 0.5, 0], [0, -h - 0.5, 0])
                 self.draw_linear_dimension(Point(base_point - left_shw, -h - 0.5),
                                            Point(base_point + left_shw, -h - 0.5), -0.25)
-            for bar_data in span_info['bars_info']['info']:
-                self.draw_beam_longitudinal_bar(h / 2, left_face, right_face, bar_data)
-            self.draw_text(span_info['span_name'], Point((left_face + right_face) / 2, 0.75), 0.10)
-            self.draw_text(span_info['stirrups_info']['text'], Point((left_face + right_face) / 2, -h - 0.4))
+            for bar in span.bars:
+                self.draw_beam_longitudinal_bar(h / 2, left_face, right_face, bar)
+            self.draw_text(span.span_name, Point((left_face + right_face) / 2, 0.75), 0.10)
+            self.draw_text(span.stirrups.text, Point((left_face + right_face) / 2, -h - 0.4))
             base_point += left_shw + fl + right_shw
-        right_edge = beam_info['spans_info'][-1]['right_support_info'][0]
-        right_height = beam_info['spans_info'][-1]['height']
+        right_edge = beam.spans[-1].right_support_width
+        right_height = beam.spans[-1].height
         if right_edge != 0:
             self.draw_line_by_points([base_point + right_edge / 2, -right_height - 0.5, 0],
                                      [base_point + right_edge / 2, 0.5, 0])
@@ -293,6 +1119,15 @@ class CAD:
             self.copy([0, 0.5, 0], [0, -right_height - 0.5, 0])
             self.draw_linear_dimension(Point(base_point - right_edge / 2, -right_height - 0.5),
                                        Point(base_point + right_edge / 2, -right_height - 0.5), -0.25)
+        return base_point
+
+    def draw_typical_beam(self, beam_info: Union[dict, Beam], beam_names: list,
+                          insertion_point: Union[Point, list] = None):
+        if insertion_point is not None:
+            with self.placed_at(insertion_point):
+                return self.draw_typical_beam(beam_info, beam_names)
+        length = self.draw_beam(beam_info)
+        self.draw_text(' = '.join(beam_name.strip() for beam_name in beam_names), Point(length / 2, 1.0), 0.10)
 
     def draw_column(self):
         pass
@@ -306,43 +1141,28 @@ class CAD:
     def draw_point(self, P0, layer='A-TRAZO'):
         if not isinstance(P0, Point):
             P0 = Point(P0)
-        P0 = self.acadModel.AddPoint(P0.APoint)
-        P0.layer = layer
-        self.objects_list.append(P0)
+        self.add_entity(Entity('point', layer, [(P0.x, P0.y, P0.z)]))
 
     def draw_line(self, L0: Line, layer: str = 'LCM-TRAZO'):
-        L1 = self.acadModel.AddLine(L0.P0.APoint, L0.P1.APoint)
-        L1.layer = layer
-        self.objects_list.append(L1)
+        self.draw_line_by_points(L0.P0, L0.P1, layer)
 
     def draw_line_by_points(self, P0: Union[Point, list], P1: Union[Point, list], layer: str = 'LCM-TRAZO'):
         if not isinstance(P0, Point):
             P0 = Point(P0)
         if not isinstance(P1, Point):
             P1 = Point(P1)
-        L1 = self.acadModel.AddLine(P0.APoint, P1.APoint)
-        L1.layer = layer
-        self.objects_list.append(L1)
+        self.add_entity(Entity('line', layer, [(P0.x, P0.y, P0.z), (P1.x, P1.y, P1.z)]))
 
     def draw_polyline(self, points, layer='LCM-TRAZO'):
-        points = aDouble(points)
-        PL1 = self.acadModel.AddPolyline(points)
-        PL1.layer = layer
-        self.objects_list.append(PL1)
+        points = points.to_list() if isinstance(points, PointArray) else list(points)
+        self.add_entity(Entity('polyline', layer, [points[i:i + 3] for i in range(0, len(points), 3)]))
 
     def draw_text(self, text: str, P0: Union[Point, list], TSize: float = 0.05, layer: str = 'LCM-TEXTOS',
                   alignment: int = 10, MText: bool = False, BoxWidth: float = 0):
         if not isinstance(P0, Point):
             P0 = Point(P0)
-        if MText:
-            T1 = self.acadModel.AddMText(P0.APoint, BoxWidth, text)
-        else:
-            T1 = self.acadModel.AddText(text, P0.APoint, TSize)
-        T1.Layer = layer
-        T1.HorizontalAlignment = 1
-        T1.TextAlignmentPoint = P0.APoint
-        T1.Alignment = alignment
-        self.objects_list.append(T1)
+        self.add_entity(Entity('text', layer, [(P0.x, P0.y, P0.z)], {
+            'text': text, 'height': TSize, 'alignment': alignment, 'mtext': MText, 'box_width': BoxWidth}))
 
     def draw_linear_dimension(self, P0: Union[Point, list], P1: Union[Point, list], text_offset: float = 0.25,
                               layer: str = 'LCM-COTAS'):
@@ -352,9 +1172,8 @@ class CAD:
             P1 = Point(P1)
         P2 = Point((P0.x + P1.x) / 2 + (text_offset if P0.x == P1.x else 0),
                    (P0.y + P1.y) / 2 + (text_offset if P0.y == P1.y else 0))
-        D1 = self.acadModel.AddDimRotated(P0.APoint, P1.APoint, P2.APoint, 0 if P0.y == P1.y else math.pi / 2)
-        D1.Layer = layer
-        self.objects_list.append(D1)
+        self.add_entity(Entity('dimension', layer, [(P0.x, P0.y, P0.z), (P1.x, P1.y, P1.z), (P2.x, P2.y, P2.z)],
+                               {'angle': 0 if P0.y == P1.y else math.pi / 2}))
 
     def draw_concrete_extension(self, P0: Union[Point, list], P1: Union[Point, list], fixed_height=0.2, ratio=0.0):
         if not isinstance(P0, Point):
@@ -381,16 +1200,17 @@ class CAD:
         self.draw_line_by_points(P2b, P1p)
         self.draw_line_by_points(P1p, P1)
 
-    def draw_beam_longitudinal_bar(self, beam_middle: float, left_face: float, right_face: float, bar_data: dict):
-        label = bar_data['label']
-        case = bar_data['case']
-        side = bar_data['side']
-        order = bar_data['order']
-        left_cut = bar_data['left_cut']
-        lc = min(left_cut)
-        right_cut = bar_data['right_cut']
-        rc = max(right_cut)
-        tie_info = bar_data['tie_info']
+    def draw_beam_longitudinal_bar(self, beam_middle: float, left_face: float, right_face: float,
+                                   bar_data: Union[dict, LongitudinalBar]):
+        bar = bar_data if isinstance(bar_data, LongitudinalBar) else LongitudinalBar.from_dict(bar_data)
+        label = bar.label
+        case = bar.case
+        side = bar.side
+        order = bar.order
+        cuts = bar.cuts
+        lc = min(cuts[0], cuts[1])
+        rc = max(cuts[2], cuts[3])
+        tie_info = bar.tie_info
         edge_offset = 0.05 + 0.05 * order
         if case == 0:
             self.draw_line_by_points(Point(left_face + lc, -beam_middle + (beam_middle - edge_offset) * side),
@@ -469,51 +1289,72 @@ class CAD:
         self.selected_objects = selection
 
     def select_all(self):
+        # A CAD drawing starts from a new document, so model space holds exactly the objects drawn through it
         self.deselect_all()
-        self.selection_set.Select(5)
-        for i in range(self.selection_set.Count):
-            self.selected_objects.append(self.selection_set.Item(i))
+        self.selected_objects = list(self.objects_list)
+
+    def select_window(self, P0, P1, layer: str = None, crossing: bool = True):
+        # Like AutoCAD's crossing (or, with crossing off, window) selection, answered from the index
+        if not isinstance(P0, Point):
+            P0 = Point(P0)
+        if not isinstance(P1, Point):
+            P1 = Point(P1)
+        self.selected_objects = self.index.query_window(P0, P1, layer, crossing)
+
+    def select_near(self, P0, radius: float, layer: str = None):
+        if not isinstance(P0, Point):
+            P0 = Point(P0)
+        self.selected_objects = self.index.query_near(P0, radius, layer)
+
+    def select_nearest(self, P0, layer: str = None, count: int = 1):
+        if not isinstance(P0, Point):
+            P0 = Point(P0)
+        self.selected_objects = self.index.query_nearest(P0, layer, count)
 
     def deselect_all(self):
         self.selected_objects = []
-        self.selection_set.Clear()
 
     def erase_all(self):
-        self.select_all()
-        self.selection_set.Erase()
+        self.deselect_all()
+        self.backend.erase_all()
+        self.objects_list = []
+        self.index.clear()
 
     def move(self, P0, P1):
-        P0 = Point(P0).APoint
-        P1 = Point(P1).APoint
+        self.backend.move(self.selected_objects, Point(P0), Point(P1))
         for obj in self.selected_objects:
-            obj.Move(P0, P1)
+            self.index.update(obj)
 
     def move_all(self, P0, P1):
-        P0 = Point(P0).APoint
-        P1 = Point(P1).APoint
         # self.select_all()
-        for obj in self.acadModel:
-            obj.Move(P0, P1)
+        self.backend.move(self.objects_list, Point(P0), Point(P1))
+        for obj in self.objects_list:
+            self.index.update(obj)
+
+    def add_copy(self, entity: Entity):
+        self.objects_list.append(entity)
+        self.index.insert(entity)
 
     def copy(self, P0, P1):
-        P0 = Point(P0).APoint
-        P1 = Point(P1).APoint
-        for obj in self.selected_objects:
-            copy = obj.Copy()
-            self.objects_list.append(copy)
-            copy.Move(P0, P1)
+        P0 = Point(P0)
+        P1 = Point(P1)
+        for obj in self.backend.copy(self.selected_objects, P0, P1):
+            self.add_copy(obj)
 
     def mirror(self, P0, P1):
-        P0 = Point(P0).APoint
-        P1 = Point(P1).APoint
-        for obj in self.selected_objects:
-            mirror = obj.Mirror(P0, P1)
-            self.objects_list.append(mirror)
+        P0 = Point(P0)
+        P1 = Point(P1)
+        if self.origin is not None:
+            P0 = Point(P0.x + self.origin.x, P0.y + self.origin.y, P0.z + self.origin.z)
+            P1 = Point(P1.x + self.origin.x, P1.y + self.origin.y, P1.z + self.origin.z)
+        for obj in self.backend.mirror(self.selected_objects, P0, P1):
+            self.add_copy(obj)
 
     def array(self, rows_number, columns_number, rows_spacing, columns_spacing, levels_num=1, levels_sp=0):
         for obj in self.selected_objects:
             try:
-                obj.ArrayRectangular(rows_number, columns_number, levels_num, rows_spacing, columns_spacing, levels_sp)
+                self.backend.array(obj, rows_number, columns_number, rows_spacing, columns_spacing, levels_num,
+                                   levels_sp)
             except KeyError:
                 pass
             finally:
@@ -521,12 +1362,12 @@ class CAD:
                 # self.list_new_objects(rows_number * columns_number * levels_num - 1)
 
     def zoom_all(self):
-        self.acad.ZoomExtents()
+        self.backend.zoom_all()
 
     def list_new_objects(self, num_objects):
         count = 0
-        for obj in self.acadModel:
-            self.objects_list.append(obj)
+        for obj in self.backend.iter_model():
+            self.add_copy(obj)
             count += 1
             if count == num_objects:
                 break
@@ -563,94 +1404,310 @@ def get_polygon_area(vertices_list):
     return area
 
 
-def reduce_vertices(vertices_list):
-    if np.array_equal(vertices_list[0], vertices_list[-1]):
-        vertices_list.pop(-1)
-    n = len(vertices_list)
-    index_list = list(range(0, n))
-    delete_list = []
-    for i in range(0, n):
-        P0 = Point(vertices_list[i])
-        P1 = Point(vertices_list[i - 1])
-        P2 = Point(vertices_list[(i + 1) % n])
-        if P0.is_collinear(Line(P1, P2)):
-            delete_list.append(i)
-    res_list = sorted(list(set(index_list) - set(delete_list)))
-    reduced_vertices_list = list(itemgetter(*res_list)(vertices_list))
-    return reduced_vertices_list
+# Distance below which reduce_vertices treats points as repeated, or a vertex as lying on its neighbours' line
+REDUCE_TOLERANCE = 1e-9
+
+
+def get_chord_distances(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # Distance of each (x, y) row to the line through its start and end rows, or to its start if the two coincide
+    dx, dy = (ends - starts).T
+    px, py = (points - starts).T
+    chords = np.hypot(dx, dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(chords > 0, np.abs(dx * py - dy * px) / chords, np.hypot(px, py))
+
+
+def reduce_vertices(vertices_list, tolerance: float = REDUCE_TOLERANCE, closed: bool = True):
+    # Drops repeated points and vertices lying on the line through their neighbours. A closed outline is a ring,
+    # its first vertex may or may not be repeated at the end; an open polyline keeps both of its ends. The input
+    # is left untouched and the vertices kept are returned as they came in
+    vertices = as_coordinates(vertices_list)[:, :2]
+    indices = np.arange(len(vertices))
+    if len(indices) < 2:
+        return list(vertices_list)
+    # A point repeating the next one goes, so a ring's closing vertex is the one dropped
+    steps = np.hypot(*(np.roll(vertices, -1, axis=0) - vertices).T)
+    repeated = steps <= tolerance
+    if not closed:
+        repeated[-1] = False
+    indices = indices[~repeated]
+    if len(indices) < (3 if closed else 2):
+        return [vertices_list[i] for i in indices]
+    points = vertices[indices]
+    # Every vertex against the line through its neighbours at once
+    keep = get_chord_distances(points, np.roll(points, 1, axis=0), np.roll(points, -1, axis=0)) > tolerance
+    if not closed:
+        keep[0] = keep[-1] = True
+    if not keep.any():
+        return [vertices_list[i] for i in indices]
+    # A run of dropped vertices can drift from the line joining the vertices kept on either side of it (a gentle
+    # arc passes every neighbour test). The farthest vertex of any such run is kept until every run is straight
+    while True:
+        kept = np.flatnonzero(keep)
+        dropped = np.flatnonzero(~keep)
+        if not len(dropped):
+            break
+        positions = np.searchsorted(kept, dropped)
+        starts = kept[positions - 1]
+        ends = kept[positions % len(kept)]
+        distances = get_chord_distances(points[dropped], points[starts], points[ends])
+        drifted = distances > tolerance
+        if not drifted.any():
+            break
+        order = np.argsort(-distances[drifted])
+        _, firsts = np.unique(starts[drifted][order], return_index=True)
+        keep[dropped[drifted][order][firsts]] = True
+    return [vertices_list[i] for i in indices[keep]]
 
 
 def get_coordinates(iterable, dimension=2):
     if not isinstance(iterable, np.ndarray):
         iterable = np.array(iterable)
-    n = int(iterable.size / dimension)
-    return np.split(iterable, n)
-
-
-def triangulate_polygon(vertices_list, get_index=False):
+    # Rows of dimension coordinates, whether the input is flat (as AutoCAD's Coordinates) or already split
+    return list(iterable.reshape(-1, dimension))
+
+
+def get_orientation(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> float:
+    # Twice the signed area of a -> b -> c, positive when counterclockwise
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+# Polygons with more vertices than this look up reflex vertices through a grid when testing ears
+TRIANGULATION_GRID_THRESHOLD = 64
+
+
+class ReflexGrid:
+    # Uniform grid of the polygon's reflex vertices, so an ear test only visits those near the candidate ear
+    def __init__(self, xs: list, ys: list, indices: set):
+        self.xs, self.ys = xs, ys
+        self.xmin, self.ymin = min(xs), min(ys)
+        cells_num = max(1, int(math.sqrt(len(xs))))
+        # Cells follow the polygon's proportions, so long thin outlines still spread over the whole grid
+        self.width = (max(xs) - self.xmin) / cells_num or 1.0
+        self.height = (max(ys) - self.ymin) / cells_num or 1.0
+        self.cells = {}
+        self.indices = indices
+        for i in indices:
+            self.cells.setdefault(self.get_cell(xs[i], ys[i]), set()).add(i)
+
+    def get_cell(self, x: float, y: float) -> tuple:
+        return int((x - self.xmin) // self.width), int((y - self.ymin) // self.height)
+
+    def discard(self, i: int):
+        self.cells.get(self.get_cell(self.xs[i], self.ys[i]), set()).discard(i)
+
+    def query(self, xmin: float, ymin: float, xmax: float, ymax: float):
+        i0, j0 = self.get_cell(xmin, ymin)
+        i1, j1 = self.get_cell(xmax, ymax)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.indices):
+            # A box over more cells than there are reflex vertices is cheaper to answer from the vertices
+            xs, ys = self.xs, self.ys
+            yield from (k for k in self.indices if xmin <= xs[k] <= xmax and ymin <= ys[k] <= ymax)
+            return
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                yield from self.cells.get((i, j), ())
+
+
+def triangulate_polygon(vertices_list, get_index=False, use_grid: bool = None, tolerance: float = REDUCE_TOLERANCE):
+    # Ear clipping over a doubly linked ring of vertices. Only reflex vertices can lie inside an ear, so they are
+    # the only ones tested, and clipping an ear only changes the status of its two neighbours: O(n^2) at worst
     if vertices_list is None:
         return False
     vertices_list = get_coordinates(vertices_list)
-    vertices_list = reduce_vertices(vertices_list)
+    vertices_list = reduce_vertices(vertices_list, tolerance)
     n = len(vertices_list)
-    if n < 3 or n > 1024:
-        raise Exception("Number of vertices exceed limits!")
-    if get_polygon_area(vertices_list) > 0:
-        counter = 1
-    else:
-        counter = -1
-    index_list = list(range(0, n))
-    triangles = []
-    triangles_index = []
-    while len(index_list) > 3:
-        for i in range(0, n):
-            a = index_list[i]
-            b = index_list[i - 1]
-            c = index_list[(i + 1) % n]
-            va = vertices_list[a]
-            vb = vertices_list[b]
-            vc = vertices_list[c]
-            vab = np.subtract(vb, va)
-            vac = np.subtract(vc, va)
-            if np.cross(vab, vac) * counter < 0:
+    if n < 3:
+        raise Exception("At least 3 non collinear vertices are needed to triangulate a polygon")
+    xs = [float(vertex[0]) for vertex in vertices_list]
+    ys = [float(vertex[1]) for vertex in vertices_list]
+    # get_polygon_area is negative for counterclockwise polygons
+    counter = -1.0 if get_polygon_area(vertices_list) > 0 else 1.0
+    previous = [i - 1 for i in range(n)]
+    previous[0] = n - 1
+    following = [i + 1 for i in range(n)]
+    following[-1] = 0
+
+    def is_reflex(i: int) -> bool:
+        b, c = previous[i], following[i]
+        return get_orientation(xs[b], ys[b], xs[i], ys[i], xs[c], ys[c]) * counter <= 0
+
+    reflex = {i for i in range(n) if is_reflex(i)}
+    grid = ReflexGrid(xs, ys, reflex) if (n > TRIANGULATION_GRID_THRESHOLD if use_grid is None else use_grid) else None
+
+    def is_ear(a: int) -> bool:
+        if a in reflex:
+            return False
+        b, c = previous[a], following[a]
+        bx, by, ax, ay, cx, cy = xs[b], ys[b], xs[a], ys[a], xs[c], ys[c]
+        if grid is None:
+            candidates = reflex
+        else:
+            candidates = grid.query(min(ax, bx, cx), min(ay, by, cy), max(ax, bx, cx), max(ay, by, cy))
+        for p in candidates:
+            if p == a or p == b or p == c:
                 continue
-            is_ear = True
-            for j in range(0, len(vertices_list)):
-                if j == a or j == b or j == c:
-                    continue
-                vp = vertices_list[j]
-                if is_point_in_triangle(vp, vb, va, vc, counter):
-                    is_ear = False
-                    break
-            if is_ear:
-                triangles.append([vertices_list[b], vertices_list[a], vertices_list[c]])
-                triangles_index.append([b, a, c])
-                index_list.pop(i)
-                break
+            px, py = xs[p], ys[p]
+            # Points on the ear's border count as inside, unless they repeat one of its corners
+            if (px, py) in ((ax, ay), (bx, by), (cx, cy)):
+                continue
+            # get_orientation written out, this is the innermost loop
+            if (((ax - bx) * (py - by) - (ay - by) * (px - bx)) * counter >= 0 and
+                    ((cx - ax) * (py - ay) - (cy - ay) * (px - ax)) * counter >= 0 and
+                    ((bx - cx) * (py - cy) - (by - cy) * (px - cx)) * counter >= 0):
+                return False
+        return True
+
+    ears = [is_ear(i) for i in range(n)]
+    # Ears waiting to be clipped, oldest first so clipping spreads around the ring. An entry is stale once its
+    # vertex was clipped or stopped being an ear
+    candidates = deque(i for i in range(n) if ears[i])
+    clipped = [False] * n
+    triangles_index = []
+    remaining = n
+    while remaining > 3:
+        if not candidates:
+            raise Exception("Polygon could not be triangulated, check it for self-intersections")
+        a = candidates.popleft()
+        if clipped[a] or not ears[a]:
+            continue
+        b, c = previous[a], following[a]
+        triangles_index.append([b, a, c])
+        following[b], previous[c] = c, b
+        clipped[a] = True
+        remaining -= 1
+        for i in (c, b):
+            if i in reflex and not is_reflex(i):
+                reflex.discard(i)
+                if grid is not None:
+                    grid.discard(i)
+            ears[i] = is_ear(i)
+            if ears[i]:
+                candidates.append(i)
+    a = next(i for i in range(n) if not clipped[i])
+    triangles_index.append([previous[a], a, following[a]])
     if get_index:
         return triangles_index
     else:
-        return triangles
-
+        return [[vertices_list[b], vertices_list[a], vertices_list[c]] for b, a, c in triangles_index]
+
+
+def get_wall_axes(vertices_list, tolerance: float = 1e-6):
+    # Centre lines of a wall outline, one polyline of (x, y) points per leg. Each triangle of the outline links
+    # the midpoints of its internal edges: sleeves (two internal edges) carry a leg on, junctions (three) meet
+    # where the axes of their legs cross and terminals (one) close the leg at the middle of the wall's end
+    vertices_list = reduce_vertices(get_coordinates(vertices_list), tolerance)
+    triangles = triangulate_polygon(vertices_list, get_index=True, tolerance=tolerance)
+    xs = [float(vertex[0]) for vertex in vertices_list]
+    ys = [float(vertex[1]) for vertex in vertices_list]
+
+    def get_mid_point(edge: tuple) -> tuple:
+        return (xs[edge[0]] + xs[edge[1]]) / 2, (ys[edge[0]] + ys[edge[1]]) / 2
+
+    def get_length(edge: tuple) -> float:
+        return math.hypot(xs[edge[1]] - xs[edge[0]], ys[edge[1]] - ys[edge[0]])
+
+    # Triangles sharing an edge find each other through its key, the sorted pair of vertex indices
+    edge_triangles = {}
+    for t, (b, a, c) in enumerate(triangles):
+        for edge in ((b, a), (a, c), (c, b)):
+            edge_triangles.setdefault((min(edge), max(edge)), []).append(t)
+    nodes = {}
+    links = {}
+
+    def link(key_1, point_1: tuple, key_2, point_2: tuple):
+        nodes[key_1], nodes[key_2] = point_1, point_2
+        links.setdefault(key_1, []).append(key_2)
+        links.setdefault(key_2, []).append(key_1)
+
+    for t, (b, a, c) in enumerate(triangles):
+        edges = [(min(edge), max(edge)) for edge in ((b, a), (a, c), (c, b))]
+        internal = [edge for edge in edges if len(edge_triangles[edge]) == 2]
+        if len(internal) == 2:
+            link(internal[0], get_mid_point(internal[0]), internal[1], get_mid_point(internal[1]))
+        elif len(internal) == 3:
+            mid_points = [get_mid_point(edge) for edge in internal]
+            centre = (sum(point[0] for point in mid_points) / 3, sum(point[1] for point in mid_points) / 3)
+            for edge, mid_point in zip(internal, mid_points):
+                link(('junction', t), centre, edge, mid_point)
+        elif len(internal) == 1:
+            # The wall's end is the shorter outline edge, if it is no wider than the wall itself; otherwise this is
+            # an outer corner and the leg stops at the internal edge
+            end = min((edge for edge in edges if edge != internal[0]), key=get_length)
+            if get_length(end) <= get_length(internal[0]) + tolerance:
+                link(internal[0], get_mid_point(internal[0]), ('end', end), get_mid_point(end))
+    # The triangles' adjacency is a tree, so every leg runs between two nodes that are not simply on the way
+    chains = []
+    visited = set()
+    for start in [key for key in links if len(links[key]) != 2]:
+        for following in links[start]:
+            if (start, following) in visited:
+                continue
+            chain = [start]
+            previous, current = start, following
+            while True:
+                visited.add((previous, current))
+                visited.add((current, previous))
+                chain.append(current)
+                if len(links[current]) != 2:
+                    break
+                previous, current = current, links[current][0] if links[current][1] == previous else links[current][1]
+            chains.append(chain)
+
+    def is_junction(key) -> bool:
+        return key[0] == 'junction'
+
+    # A junction triangle's midpoints lie on the axes of its legs but its centre lies on none of them, so the
+    # junction moves to where the legs' axes cross. Each leg's axis runs through its first two points
+    leg_axes = {}
+    for chain in chains:
+        for leg in (chain, chain[::-1]):
+            if is_junction(leg[0]) and len(leg) > 2 and not is_junction(leg[1]) and not is_junction(leg[2]):
+                leg_axes.setdefault(leg[0], []).append((nodes[leg[1]], nodes[leg[2]]))
+    for key, key_axes in leg_axes.items():
+        crossings = []
+        for i, ((ax, ay), (bx, by)) in enumerate(key_axes):
+            for (cx, cy), (dx, dy) in key_axes[i + 1:]:
+                determinant = (bx - ax) * (dy - cy) - (by - ay) * (dx - cx)
+                if abs(determinant) <= tolerance * math.hypot(bx - ax, by - ay) * math.hypot(dx - cx, dy - cy):
+                    continue
+                along = ((cx - ax) * (dy - cy) - (cy - ay) * (dx - cx)) / determinant
+                crossings.append((ax + along * (bx - ax), ay + along * (by - ay)))
+        if crossings:
+            nodes[key] = (sum(x for x, _ in crossings) / len(crossings), sum(y for _, y in crossings) / len(crossings))
+
+    def trim_leg(points: list):
+        # Drops the points that overshoot the junction at points[0], i.e. that lie past it seen from the next point
+        jx, jy = points[0]
+        while len(points) > 2:
+            (px, py), (qx, qy) = points[1], points[2]
+            if (jx - px) * (qx - px) + (jy - py) * (qy - py) <= tolerance ** 2:
+                break
+            del points[1]
+        return points
 
-def get_wall_axes(vertices_list):
-    triangles = triangulate_polygon(vertices_list)
     axes = []
-    adjacent = []
-    for i in range(len(triangles)):
-        a_set = set(triangles[i])
-        for j in range(len(triangles)):
-            if i == j or [i, j] in adjacent:
-                continue
-            b_set = set(triangles[j])
-            if len(a_set.intersection(b_set)) == 2:
-                axes.append([triangles[i], triangles[j]])
-                adjacent.append([j, i])
+    for chain in chains:
+        points = [nodes[key] for key in chain]
+        if is_junction(chain[0]) and is_junction(chain[-1]) and \
+                math.hypot(points[-1][0] - points[0][0], points[-1][1] - points[0][1]) <= tolerance:
+            # Two junction triangles of one crossing meet at the same point and the stub between them goes
+            continue
+        if is_junction(chain[0]):
+            points = trim_leg(points)
+        if is_junction(chain[-1]):
+            points = trim_leg(points[::-1])[::-1]
+        axes.append(reduce_vertices(points, tolerance, closed=False))
     return axes
 
 
 if __name__ == '__main__':
-    draftsman = CAD('Drawing1.dwg')
+    parser = argparse.ArgumentParser(description='Draw the beams of a design workbook')
+    parser.add_argument('--typical', action='store_true',
+                        help='draw each group of identical beams once, labelled with all of their names')
+    args = parser.parse_args()
+    # Without pywin32 (e.g. on Linux) the drawing is written to Drawing1.dxf instead of a live AutoCAD session
+    draftsman = CAD('Drawing1.dwg', 'com' if win32com is not None else 'dxf')
     assistant = Assistant('Beams_info')
     # draftsman.selection_set.Clear()
     # draftsman.selection_set.SelectOnScreen()
@@ -695,13 +1752,15 @@ if __name__ == '__main__':
 
     # draftsman.select_all()
     # draftsman.move([0, 0, 0], [0, 5, 0])
-    assistant.download_excel_beams_info()
-    with open('Beams_info') as jsonFile:
-        beams_info = json.load(jsonFile)
-    for name, info in beams_info.items():
-        draftsman.draw_beam(info)
-        draftsman.select_all()
-        draftsman.move([0, 0, 0], [0, 5, 0])
+    # Each beam is drawn straight at its place in the layout, below the one before it
+    layout = BeamLayout()
+    if args.typical:
+        assistant.download_excel_beams_info(deduplicate=True)
+        for beam_names, info in assistant.iter_typical_beams():
+            draftsman.draw_beam_in_layout(info, layout, beam_names)
+    else:
+        for name, info in assistant.stream_excel_beams_info():
+            draftsman.draw_beam_in_layout(info, layout)
     # beam_geo = [[0.25, 0.25, 0.25],
     #             [0.6, 0.8, 0.5],
     #             [5, 5, 6]]
@@ -715,6 +1774,8 @@ if __name__ == '__main__':
     #                  [],
     #                  []]]
     draftsman.zoom_all()
+    if isinstance(draftsman.backend, DxfBackend):
+        draftsman.save()
 
 # ANNOTATE
 # AN1 = acad.model.AddDimAligned(PBase, PEnd, PAnnotateEnd)
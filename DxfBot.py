@@ -0,0 +1,237 @@
+import math
+
+# AcAlignment value -> (DXF horizontal justification (72), vertical justification (73))
+TEXT_ALIGNMENTS = {0: (0, 0), 1: (1, 0), 2: (2, 0), 3: (3, 0), 4: (4, 0), 5: (5, 0), 6: (0, 3), 7: (1, 3),
+                   8: (2, 3), 9: (0, 2), 10: (1, 2), 11: (2, 2), 12: (0, 1), 13: (1, 1), 14: (2, 1)}
+# R12 DIMSTYLE / $DIM header group codes of the dimension variables this writer knows about
+DIM_VARIABLES = {'DIMSCALE': 40, 'DIMASZ': 41, 'DIMEXO': 42, 'DIMDLI': 43, 'DIMEXE': 44, 'DIMRND': 45,
+                 'DIMDLE': 46, 'DIMTXT': 140, 'DIMCEN': 141, 'DIMTSZ': 142, 'DIMALTF': 143, 'DIMLFAC': 144,
+                 'DIMTFAC': 146, 'DIMGAP': 147, 'DIMTIH': 73, 'DIMTOH': 74, 'DIMTAD': 77, 'DIMZIN': 78,
+                 'DIMBLK': 5, 'DIMBLK1': 6, 'DIMBLK2': 7}
+DEFAULT_DIM_STYLE = {'DIMSCALE': 1.0, 'DIMASZ': 0.18, 'DIMEXO': 0.0625, 'DIMDLI': 0.38, 'DIMEXE': 0.18,
+                     'DIMRND': 0.0, 'DIMDLE': 0.0, 'DIMTXT': 0.18, 'DIMCEN': 0.09, 'DIMTSZ': 0.0, 'DIMALTF': 25.4,
+                     'DIMLFAC': 1.0, 'DIMTFAC': 1.0, 'DIMGAP': 0.09, 'DIMTIH': 1, 'DIMTOH': 1, 'DIMTAD': 0,
+                     'DIMZIN': 0, 'DIMBLK': '', 'DIMBLK1': '', 'DIMBLK2': ''}
+# Precision used for dimension text; R12 has no DIMDEC, this matches the metric (ISO-25) default
+DIM_DECIMALS = 2
+
+
+def format_number(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    text = repr(float(value))
+    return text[:-2] if text.endswith('.0') else text
+
+
+def format_measurement(measurement: float, zero_suppression: int = 0, rounding: float = 0.0):
+    if rounding:
+        measurement = round(measurement / rounding) * rounding
+    text = '{0:.{1}f}'.format(measurement, DIM_DECIMALS)
+    if zero_suppression & 8 and '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if zero_suppression & 4 and text.startswith('0.'):
+        text = text[1:]
+    return text
+
+
+class DxfDocument:
+    # Minimal AutoCAD R12 (AC1009) DXF writer: layers, one text style, dimension styles, points, lines, polylines,
+    # text and rotated dimensions. R12 needs no handles or object dictionaries and every AutoCAD release opens it
+    def __init__(self):
+        self.layers = {'0': (7, 'CONTINUOUS')}
+        self.line_types = ['CONTINUOUS']
+        self.dim_styles = {'STANDARD': dict(DEFAULT_DIM_STYLE)}
+        self.dim_style = 'STANDARD'
+        self.active_layer = '0'
+        self.entities = []
+        self.blocks = []
+        self.extents = None
+        self.view = None
+
+    def add_layer(self, name: str, color: int = 7, line_type: str = 'CONTINUOUS'):
+        if line_type.upper() not in [known.upper() for known in self.line_types]:
+            self.line_types.append(line_type)
+        self.layers[name] = (color, line_type)
+
+    def add_dim_style(self, name: str, variables: dict):
+        dim_style = dict(DEFAULT_DIM_STYLE)
+        dim_style.update({key: value for key, value in variables.items() if key in DIM_VARIABLES})
+        self.dim_styles[name] = dim_style
+
+    def update_extents(self, points):
+        for x, y, _ in points:
+            if self.extents is None:
+                self.extents = [x, y, x, y]
+            else:
+                self.extents = [min(self.extents[0], x), min(self.extents[1], y),
+                                max(self.extents[2], x), max(self.extents[3], y)]
+
+    def add_point(self, P0, layer: str = None):
+        self.update_extents([P0])
+        self.entities.append(['POINT', (8, layer or self.active_layer)] + self.get_coordinates(10, P0))
+
+    def add_line(self, P0, P1, layer: str = None, color: int = None):
+        self.update_extents([P0, P1])
+        self.entities.append(self.get_line(P0, P1, layer or self.active_layer, color))
+
+    def add_polyline(self, points: list, layer: str = None, closed: bool = False):
+        self.update_extents(points)
+        layer = layer or self.active_layer
+        polyline = ['POLYLINE', (8, layer), (66, 1), (10, 0.0), (20, 0.0), (30, points[0][2] if points else 0.0),
+                    (70, 1 if closed else 0)]
+        self.entities.append(polyline)
+        for point in points:
+            self.entities.append(['VERTEX', (8, layer)] + self.get_coordinates(10, point))
+        self.entities.append(['SEQEND', (8, layer)])
+
+    def add_text(self, text: str, P0, height: float, layer: str = None, alignment: int = 0, angle: float = 0.0):
+        self.update_extents([P0])
+        self.entities.append(self.get_text(text, P0, height, layer or self.active_layer, alignment, angle))
+
+    def add_dim_rotated(self, P0, P1, P2, angle: float, layer: str = None, dim_style: str = None):
+        # The dimension picture lives in an anonymous *D block, as AutoCAD would have generated it
+        dim_style = dim_style or self.dim_style
+        variables = self.dim_styles[dim_style]
+        scale = variables['DIMSCALE'] or 1.0
+        u = (math.cos(angle), math.sin(angle))
+        n = (-u[1], u[0])
+        # Feet of both extension lines on the dimension line through P2
+        d0 = [P2[0] + u[0] * ((P0[0] - P2[0]) * u[0] + (P0[1] - P2[1]) * u[1]),
+              P2[1] + u[1] * ((P0[0] - P2[0]) * u[0] + (P0[1] - P2[1]) * u[1]), P2[2]]
+        d1 = [P2[0] + u[0] * ((P1[0] - P2[0]) * u[0] + (P1[1] - P2[1]) * u[1]),
+              P2[1] + u[1] * ((P1[0] - P2[0]) * u[0] + (P1[1] - P2[1]) * u[1]), P2[2]]
+        mid = [(d0[0] + d1[0]) / 2, (d0[1] + d1[1]) / 2, P2[2]]
+        # Text goes on the side of the dimension line away from the measured points
+        if (P0[0] - mid[0]) * n[0] + (P0[1] - mid[1]) * n[1] > 0:
+            n = (-n[0], -n[1])
+        measurement = abs((P1[0] - P0[0]) * u[0] + (P1[1] - P0[1]) * u[1]) * variables['DIMLFAC']
+        text_height = variables['DIMTXT'] * scale
+        gap = variables['DIMGAP'] * scale
+        text_point = [mid[0] + n[0] * (gap + text_height / 2), mid[1] + n[1] * (gap + text_height / 2), P2[2]]
+        block_name = '*D{0}'.format(len(self.blocks) + 1)
+        block = []
+        for origin, foot in [(P0, d0), (P1, d1)]:
+            length = math.hypot(foot[0] - origin[0], foot[1] - origin[1])
+            if length > 0:
+                e = ((foot[0] - origin[0]) / length, (foot[1] - origin[1]) / length)
+                start = [origin[0] + e[0] * variables['DIMEXO'] * scale,
+                         origin[1] + e[1] * variables['DIMEXO'] * scale, P2[2]]
+                end = [foot[0] + e[0] * variables['DIMEXE'] * scale, foot[1] + e[1] * variables['DIMEXE'] * scale,
+                       P2[2]]
+                block.append(self.get_line(start, end, '0', 0))
+        tick = variables['DIMTSZ'] * scale
+        extension = variables['DIMDLE'] * scale if tick else 0.0
+        direction = 1 if (d1[0] - d0[0]) * u[0] + (d1[1] - d0[1]) * u[1] >= 0 else -1
+        block.append(self.get_line([d0[0] - u[0] * extension * direction, d0[1] - u[1] * extension * direction,
+                                    P2[2]],
+                                   [d1[0] + u[0] * extension * direction, d1[1] + u[1] * extension * direction,
+                                    P2[2]], '0', 0))
+        for foot in [d0, d1]:
+            if tick:
+                # Oblique stroke at 45 degrees to the dimension line
+                t = ((u[0] - u[1]) * tick / 2, (u[1] + u[0]) * tick / 2)
+                block.append(self.get_line([foot[0] - t[0], foot[1] - t[1], P2[2]],
+                                           [foot[0] + t[0], foot[1] + t[1], P2[2]], '0', 0))
+        text_angle = angle % (2 * math.pi)
+        if math.pi / 2 < text_angle <= 3 * math.pi / 2:
+            text_angle -= math.pi
+        text = format_measurement(measurement, variables['DIMZIN'], variables['DIMRND'])
+        block.append(self.get_text(text, text_point, text_height, '0', 10, text_angle, 0))
+        for point in [P0, P1, d1]:
+            block.append(['POINT', (8, 'DEFPOINTS')] + self.get_coordinates(10, point))
+        self.blocks.append((block_name, block))
+        self.update_extents([P0, P1, P2, text_point])
+        self.entities.append(['DIMENSION', (8, layer or self.active_layer), (2, block_name), (3, dim_style)] +
+                             self.get_coordinates(10, d1) + self.get_coordinates(11, text_point) +
+                             [(70, 0)] + self.get_coordinates(13, P0) + self.get_coordinates(14, P1) +
+                             [(50, math.degrees(angle))])
+
+    def zoom_extents(self):
+        self.view = self.extents
+
+    @staticmethod
+    def get_coordinates(code: int, P0):
+        return [(code, P0[0]), (code + 10, P0[1]), (code + 20, P0[2] if len(P0) > 2 else 0.0)]
+
+    def get_line(self, P0, P1, layer: str, color: int = None):
+        line = ['LINE', (8, layer)] + ([(62, color)] if color is not None else [])
+        return line + self.get_coordinates(10, P0) + self.get_coordinates(11, P1)
+
+    def get_text(self, text: str, P0, height: float, layer: str, alignment: int = 0, angle: float = 0.0,
+                 color: int = None):
+        horizontal, vertical = TEXT_ALIGNMENTS.get(alignment, (0, 0))
+        entity = ['TEXT', (8, layer)] + ([(62, color)] if color is not None else [])
+        entity += self.get_coordinates(10, P0) + [(40, height), (1, text), (50, math.degrees(angle)),
+                                                  (72, horizontal), (73, vertical)]
+        if horizontal or vertical:
+            entity += self.get_coordinates(11, P0)
+        return entity
+
+    def get_header(self):
+        extents = self.extents or [0.0, 0.0, 0.0, 0.0]
+        header = [(9, '$ACADVER'), (1, 'AC1009'), (9, '$DWGCODEPAGE'), (3, 'ANSI_1252'),
+                  (9, '$INSBASE'), (10, 0.0), (20, 0.0), (30, 0.0),
+                  (9, '$EXTMIN'), (10, extents[0]), (20, extents[1]), (30, 0.0),
+                  (9, '$EXTMAX'), (10, extents[2]), (20, extents[3]), (30, 0.0),
+                  (9, '$CLAYER'), (8, self.active_layer), (9, '$TEXTSTYLE'), (7, 'STANDARD'),
+                  (9, '$DIMSTYLE'), (2, self.dim_style)]
+        # Header variables use the generic codes: 1 for names, 70 for integers, 40 for reals
+        for key, value in self.dim_styles[self.dim_style].items():
+            header += [(9, '$' + key), (1 if isinstance(value, str) else 70 if isinstance(value, int) else 40, value)]
+        return header
+
+    def get_tables(self):
+        tables = []
+        if self.view is not None:
+            width, height = self.view[2] - self.view[0], self.view[3] - self.view[1]
+            tables += [(0, 'TABLE'), (2, 'VPORT'), (70, 1),
+                       (0, 'VPORT'), (2, '*ACTIVE'), (70, 0), (10, 0.0), (20, 0.0), (11, 1.0), (21, 1.0),
+                       (12, (self.view[0] + self.view[2]) / 2), (22, (self.view[1] + self.view[3]) / 2),
+                       (13, 0.0), (23, 0.0), (14, 1.0), (24, 1.0), (15, 0.0), (25, 0.0),
+                       (16, 0.0), (26, 0.0), (36, 1.0), (17, 0.0), (27, 0.0), (37, 0.0),
+                       (40, max(height, width / 1.5, 1.0) * 1.05), (41, 1.5), (42, 50.0), (43, 0.0), (44, 0.0),
+                       (50, 0.0), (51, 0.0), (71, 0), (72, 100), (73, 1), (74, 3), (75, 0), (76, 0), (77, 0),
+                       (78, 0), (0, 'ENDTAB')]
+        tables += [(0, 'TABLE'), (2, 'LTYPE'), (70, len(self.line_types))]
+        for line_type in self.line_types:
+            # Only the names are written; patterns other than continuous would need the .lin definitions
+            tables += [(0, 'LTYPE'), (2, line_type), (70, 0), (3, line_type), (72, 65), (73, 0), (40, 0.0)]
+        tables += [(0, 'ENDTAB'), (0, 'TABLE'), (2, 'LAYER'), (70, len(self.layers) + 1)]
+        for name, (color, line_type) in list(self.layers.items()) + [('DEFPOINTS', (7, 'CONTINUOUS'))]:
+            tables += [(0, 'LAYER'), (2, name), (70, 0), (62, color), (6, line_type)]
+        tables += [(0, 'ENDTAB'), (0, 'TABLE'), (2, 'STYLE'), (70, 1),
+                   (0, 'STYLE'), (2, 'STANDARD'), (70, 0), (40, 0.0), (41, 1.0), (50, 0.0), (71, 0), (42, 0.2),
+                   (3, 'txt'), (4, ''), (0, 'ENDTAB'), (0, 'TABLE'), (2, 'DIMSTYLE'), (70, len(self.dim_styles))]
+        for name, variables in self.dim_styles.items():
+            tables += [(0, 'DIMSTYLE'), (2, name), (70, 0)]
+            tables += [(DIM_VARIABLES[key], value) for key, value in variables.items()]
+        tables += [(0, 'ENDTAB')]
+        return tables
+
+    def write(self, dxfFile):
+        def write_groups(groups):
+            dxfFile.write(''.join('{0:>3}\n{1}\n'.format(code, value if isinstance(value, str)
+                                                          else format_number(value)) for code, value in groups))
+
+        def write_entity(entity):
+            write_groups([(0, entity[0])] + entity[1:])
+
+        write_groups([(0, 'SECTION'), (2, 'HEADER')] + self.get_header() + [(0, 'ENDSEC')])
+        write_groups([(0, 'SECTION'), (2, 'TABLES')] + self.get_tables() + [(0, 'ENDSEC')])
+        write_groups([(0, 'SECTION'), (2, 'BLOCKS')])
+        for block_name, block in self.blocks:
+            write_groups([(0, 'BLOCK'), (8, '0'), (2, block_name), (70, 1), (10, 0.0), (20, 0.0), (30, 0.0),
+                          (3, block_name)])
+            for entity in block:
+                write_entity(entity)
+            write_groups([(0, 'ENDBLK'), (8, '0')])
+        write_groups([(0, 'ENDSEC'), (0, 'SECTION'), (2, 'ENTITIES')])
+        for entity in self.entities:
+            write_entity(entity)
+        write_groups([(0, 'ENDSEC'), (0, 'EOF')])
+
+    def save(self, fileName: str):
+        with open(fileName, 'w', encoding='cp1252', errors='replace', newline='\r\n') as dxfFile:
+            self.write(dxfFile)
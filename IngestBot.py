@@ -0,0 +1,134 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from AssistantBot import Assistant, DEFAULT_STORE_NAMES, SPAN_READERS, STORES
+
+WORKBOOK_PATTERNS = ['*.xlsx', '*.xlsm']
+# One store per workbook goes here unless --output says otherwise
+DEFAULT_STORES_DIRECTORY = 'beams_stores'
+
+
+def find_workbooks(sources: list):
+    xlsxFilePaths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths = [path for pattern in WORKBOOK_PATTERNS for path in glob.glob(os.path.join(source, pattern))]
+        else:
+            paths = glob.glob(source)
+        for path in sorted(paths):
+            # Skip the lock files Excel leaves next to open workbooks
+            if os.path.basename(path).startswith('~$') or path in xlsxFilePaths:
+                continue
+            xlsxFilePaths.append(path)
+    return xlsxFilePaths
+
+
+def get_workbook_names(xlsxFilePaths: list):
+    # Each workbook is named by its path below the folder all of them share, without extension, so blockA/Vigas.xlsx
+    # and blockB/Vigas.xlsx keep apart
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in xlsxFilePaths])
+    names = {}
+    for path in xlsxFilePaths:
+        name = os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0].replace(os.sep, '/')
+        if name in names.values():
+            raise Exception("{0} and {1} would share the name {2}".format(
+                next(other for other, other_name in names.items() if other_name == name), path, name))
+        names[path] = name
+    return names
+
+
+def get_store_name(workbook_name: str, output: str, merge: bool):
+    if merge:
+        return output
+    return os.path.join(output, *workbook_name.split('/'))
+
+
+def ingest_workbook(xlsxFilePath, jsonFileName: str, engine: str, store: str, merge: bool, star_index: int,
+                    prefix: str = None):
+    start = time.perf_counter()
+    try:
+        assistant = Assistant(jsonFileName, xlsxFilePath, engine, store)
+        try:
+            sheets_num = len(assistant.wb.sheetnames) - star_index
+            assistant.download_excel_beams_info(star_index, merge=merge, prefix=prefix)
+        finally:
+            assistant.wb.close()
+            assistant.store.close()
+    except Exception as error:
+        return {'path': xlsxFilePath, 'sheets': 0, 'seconds': time.perf_counter() - start,
+                'error': '{0}: {1}'.format(type(error).__name__, error)}
+    return {'path': xlsxFilePath, 'sheets': sheets_num, 'seconds': time.perf_counter() - start, 'error': None}
+
+
+def get_beam_prefix(workbook_name: str):
+    return workbook_name + '/'
+
+
+def ingest_workbooks(xlsxFilePaths: list, output: str, engine: str = 'xml', store: str = 'json',
+                     merge: bool = False, workers: int = 1, star_index: int = 6, prefix: bool = False):
+    if not merge:
+        if os.path.exists(output) and not os.path.isdir(output):
+            raise Exception("{0} is a file, not a directory for one store per workbook".format(output))
+        os.makedirs(output, exist_ok=True)
+    elif os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    workbook_names = get_workbook_names(xlsxFilePaths)
+    if not merge:
+        for workbook_name in workbook_names.values():
+            os.makedirs(os.path.dirname(get_store_name(workbook_name, output, merge)), exist_ok=True)
+    start = time.perf_counter()
+    results = []
+    # Each workbook is ingested in its own process; merged runs rely on the store lock to take turns writing and
+    # fail a workbook whose beam names another workbook already put in the store, unless the names are prefixed
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(ingest_workbook, xlsxFilePath, get_store_name(workbook_name, output, merge),
+                                   engine, store, merge, star_index,
+                                   get_beam_prefix(workbook_name) if prefix else None)
+                   for xlsxFilePath, workbook_name in workbook_names.items()]
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            if result['error'] is None:
+                print('{0:<40} {1:6d} sheets {2:8.2f} s {3:8.1f} sheets/s'.format(
+                    result['path'], result['sheets'], result['seconds'],
+                    result['sheets'] / result['seconds'] if result['seconds'] else 0))
+            else:
+                print('{0:<40} FAILED  {1}'.format(result['path'], result['error']))
+    seconds = time.perf_counter() - start
+    sheets_num = sum(result['sheets'] for result in results)
+    failures = [result for result in results if result['error'] is not None]
+    print('{0} workbooks, {1} sheets in {2:.2f} s ({3:.1f} sheets/s), {4} failed'.format(
+        len(results), sheets_num, seconds, sheets_num / seconds if seconds else 0, len(failures)))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest design workbooks into beam stores without the GUI')
+    parser.add_argument('sources', nargs='+', help='workbook files, directories or glob patterns')
+    parser.add_argument('--output', help='store file when merging, otherwise the directory for one store per '
+                                         'workbook (default: {0})'.format(DEFAULT_STORES_DIRECTORY))
+    parser.add_argument('--merge', action='store_true', help='ingest every workbook into the single store --output')
+    parser.add_argument('--prefix', action='store_true',
+                        help='name beams "<workbook>/<beam>" so workbooks sharing beam names can be merged')
+    parser.add_argument('--engine', choices=sorted(SPAN_READERS), default='xml')
+    parser.add_argument('--store', choices=sorted(STORES), default='json')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--star-index', type=int, default=6, help='index of the first span sheet')
+    args = parser.parse_args()
+    xlsxFilePaths = find_workbooks(args.sources)
+    if not xlsxFilePaths:
+        parser.error('no workbooks found')
+    if args.output is None:
+        args.output = DEFAULT_STORE_NAMES[args.store] if args.merge else DEFAULT_STORES_DIRECTORY
+    if not args.merge and os.path.exists(args.output) and not os.path.isdir(args.output):
+        parser.error('--output {0} is a file; without --merge it must be a directory'.format(args.output))
+    try:
+        get_workbook_names(xlsxFilePaths)
+    except Exception as error:
+        parser.error(str(error))
+    results = ingest_workbooks(xlsxFilePaths, args.output, args.engine, args.store, args.merge, args.workers,
+                               args.star_index, args.prefix)
+    sys.exit(1 if any(result['error'] is not None for result in results) else 0)
@@ -0,0 +1,212 @@
+from collections import Counter
+
+
+class ComRecorder:
+    # Counts the calls made into a stand-in AutoCAD. Each method call, property read or property write
+    # would be one COM round trip against the real application
+    def __init__(self):
+        self.calls = Counter()
+
+    def record(self, name: str):
+        self.calls[name] += 1
+
+    @property
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+
+    def summary(self):
+        lines = ['{0:>8}  {1}'.format(count, name) for name, count in self.calls.most_common()]
+        return '\n'.join(lines + ['{0:>8}  round trips'.format(self.round_trips)])
+
+
+class RecordingObject:
+    # Property writes are counted; objects made by Add*/Copy/Mirror are kept so model space can be iterated
+    def __init__(self, recorder: ComRecorder, kind: str, *args):
+        object.__setattr__(self, 'recorder', recorder)
+        object.__setattr__(self, 'kind', kind)
+        object.__setattr__(self, 'args', args)
+
+    def __setattr__(self, name, value):
+        self.recorder.record('{0}.{1} ='.format(self.kind, name))
+        object.__setattr__(self, name, value)
+
+    def call(self, name: str):
+        self.recorder.record('{0}.{1}()'.format(self.kind, name))
+
+
+class RecordingEntity(RecordingObject):
+    def __init__(self, recorder: ComRecorder, kind: str, model, *args):
+        super().__init__(recorder, kind, *args)
+        object.__setattr__(self, 'model', model)
+
+    def Move(self, P0, P1):
+        self.call('Move')
+
+    def Copy(self):
+        self.call('Copy')
+        return self.model.append(RecordingEntity(self.recorder, self.kind, self.model, *self.args))
+
+    def Mirror(self, P0, P1):
+        self.call('Mirror')
+        return self.model.append(RecordingEntity(self.recorder, self.kind, self.model, *self.args))
+
+    def ArrayRectangular(self, *args):
+        self.call('ArrayRectangular')
+
+    def Delete(self):
+        self.call('Delete')
+        self.model.remove(self)
+
+    def CopyFrom(self, source):
+        self.call('CopyFrom')
+
+
+class RecordingModelSpace(RecordingObject):
+    def __init__(self, recorder: ComRecorder):
+        super().__init__(recorder, 'ModelSpace')
+        object.__setattr__(self, 'entities', [])
+
+    def append(self, entity: RecordingEntity):
+        self.entities.append(entity)
+        return entity
+
+    def remove(self, entity: RecordingEntity):
+        self.entities.remove(entity)
+
+    def add(self, kind: str, *args):
+        self.call('Add' + kind)
+        return self.append(RecordingEntity(self.recorder, kind, self, *args))
+
+    def AddPoint(self, *args):
+        return self.add('Point', *args)
+
+    def AddLine(self, *args):
+        return self.add('Line', *args)
+
+    def AddPolyline(self, *args):
+        return self.add('Polyline', *args)
+
+    def AddLightWeightPolyline(self, *args):
+        return self.add('LightWeightPolyline', *args)
+
+    def AddText(self, *args):
+        return self.add('Text', *args)
+
+    def AddMText(self, *args):
+        return self.add('MText', *args)
+
+    def AddDimRotated(self, *args):
+        return self.add('DimRotated', *args)
+
+    @property
+    def Count(self):
+        self.call('Count')
+        return len(self.entities)
+
+    def __iter__(self):
+        for entity in list(self.entities):
+            self.call('Item')
+            yield entity
+
+
+class RecordingCollection(RecordingObject):
+    def Add(self, name: str):
+        self.call('Add')
+        return RecordingEntity(self.recorder, self.kind[:-1], None, name)
+
+    def Load(self, *args):
+        self.call('Load')
+
+
+class RecordingSelectionSet(RecordingObject):
+    def __init__(self, recorder: ComRecorder, model: RecordingModelSpace):
+        super().__init__(recorder, 'SelectionSet')
+        object.__setattr__(self, 'model', model)
+        object.__setattr__(self, 'selected', [])
+
+    def Clear(self):
+        self.call('Clear')
+        object.__setattr__(self, 'selected', [])
+
+    def Select(self, mode, *args):
+        self.call('Select')
+        object.__setattr__(self, 'selected', list(self.model.entities))
+
+    def Erase(self):
+        self.call('Erase')
+        for entity in self.selected:
+            self.model.remove(entity)
+        object.__setattr__(self, 'selected', [])
+
+    @property
+    def Count(self):
+        self.call('Count')
+        return len(self.selected)
+
+    def Item(self, index: int):
+        self.call('Item')
+        return self.selected[index]
+
+
+class RecordingDocument(RecordingObject):
+    def __init__(self, recorder: ComRecorder):
+        super().__init__(recorder, 'Document')
+        model = RecordingModelSpace(recorder)
+        for name, value in [('_ModelSpace', model), ('_ActiveSelectionSet', RecordingSelectionSet(recorder, model)),
+                            ('_Layers', RecordingCollection(recorder, 'Layers')),
+                            ('_Linetypes', RecordingCollection(recorder, 'Linetypes')),
+                            ('_DimStyles', RecordingCollection(recorder, 'DimStyles')), ('variables', {})]:
+            object.__setattr__(self, name, value)
+
+    def get(self, name: str):
+        self.call(name)
+        return object.__getattribute__(self, '_' + name)
+
+    ModelSpace = property(lambda self: self.get('ModelSpace'))
+    ActiveSelectionSet = property(lambda self: self.get('ActiveSelectionSet'))
+    Layers = property(lambda self: self.get('Layers'))
+    Linetypes = property(lambda self: self.get('Linetypes'))
+    DimStyles = property(lambda self: self.get('DimStyles'))
+
+    def SetVariable(self, name: str, value):
+        self.call('SetVariable')
+        self.variables[name] = value
+
+    def GetVariable(self, name: str):
+        self.call('GetVariable')
+        return self.variables.get(name)
+
+    def SendCommand(self, command: str):
+        self.call('SendCommand')
+
+    def SaveAs(self, file_name: str):
+        self.call('SaveAs')
+
+
+class RecordingApplication(RecordingObject):
+    # Drop-in for win32com.client.Dispatch("AutoCAD.Application"), e.g. ComBackend(application=...)
+    def __init__(self, recorder: ComRecorder = None):
+        recorder = ComRecorder() if recorder is None else recorder
+        super().__init__(recorder, 'Application')
+        object.__setattr__(self, 'documents', [])
+
+    @property
+    def Documents(self):
+        self.call('Documents')
+        return self
+
+    def Add(self):
+        self.call('Add')
+        self.documents.append(RecordingDocument(self.recorder))
+        return self.documents[-1]
+
+    @property
+    def ActiveDocument(self):
+        self.call('ActiveDocument')
+        return self.documents[-1]
+
+    def ZoomExtents(self):
+        self.call('ZoomExtents')